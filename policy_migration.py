@@ -13,18 +13,24 @@ import sys
 import json
 import logging
 import argparse
+import operator
 import pandas as pd
 from datetime import datetime, timedelta
-from dateutil.relativedelta import relativedelta
 import requests
 import re
 import time
 import base64
-from typing import Dict, List, Set, Optional, Tuple
+from typing import Dict, List, Set, Optional, Tuple, Union
 from pathlib import Path
 import asyncio
 import aiohttp
 
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
@@ -40,6 +46,10 @@ GITHUB_API_URL = "https://api.github.com"
 GITHUB_USERNAME = "grijalva10"
 GITHUB_TOKEN = os.environ.get("GITHUB_TOKEN")
 
+# Precompiled patterns for currency and column name cleanup
+CURRENCY_RE = re.compile(r'[^\d.-]')
+COLUMN_NAME_RE = re.compile(r'[^a-z0-9_]')
+
 # Global mappings
 BROKER_MAPPING = None
 CARRIER_MAPPING = None
@@ -121,13 +131,14 @@ def parse_arguments() -> argparse.Namespace:
     parser.add_argument("--skip-ams-fetch", action="store_true", help="Skip AMS policy fetch")
     return parser.parse_args()
 
+DATE_FORMATS = ['%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%m/%d/%Y', '%m/%d/%y', '%d-%b-%Y', '%d-%b-%y']
+
 def parse_date(date_str: str) -> Optional[str]:
     """Parse date string with multiple formats."""
     if pd.isna(date_str) or not date_str:
         return None
     date_str = str(date_str).strip()
-    formats = ['%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%m/%d/%Y', '%m/%d/%y', '%d-%b-%Y', '%d-%b-%y']
-    for fmt in formats:
+    for fmt in DATE_FORMATS:
         try:
             return datetime.strptime(date_str, fmt).strftime('%Y-%m-%d')
         except ValueError:
@@ -135,6 +146,26 @@ def parse_date(date_str: str) -> Optional[str]:
     logger.debug(f"Failed to parse date: {date_str}")
     return None
 
+def vectorized_parse_date(s: pd.Series) -> pd.Series:
+    """Parse a column of date strings to YYYY-MM-DD, or None where no format matches.
+
+    Each distinct value is parsed once, trying each format only on the values still unparsed.
+    """
+    values = s[s.notna()].astype(str).str.strip()
+    remaining = pd.Series(values[values != ''].unique(), dtype=object)
+    parsed_dates = {}
+    for fmt in DATE_FORMATS:
+        if remaining.empty:
+            break
+        parsed = pd.to_datetime(remaining, format=fmt, errors='coerce')
+        ok = parsed.notna()
+        parsed_dates.update(zip(remaining[ok], parsed[ok].dt.strftime('%Y-%m-%d')))
+        remaining = remaining[~ok]
+    if not remaining.empty:
+        logger.debug(f"Failed to parse {len(remaining)} distinct dates: {', '.join(remaining[:10])}")
+    result = values.map(parsed_dates).reindex(s.index).astype(object)
+    return result.where(result.notna(), None)
+
 def parse_currency(value: any) -> float:
     """Convert currency string to float with improved handling."""
     if pd.isna(value) or value is None:
@@ -144,18 +175,25 @@ def parse_currency(value: any) -> float:
     value_str = str(value).strip()
     if not value_str:
         return 0.0
-    value_str = re.sub(r'[^\d.-]', '', value_str)  # Remove all non-numeric except . and -
+    value_str = CURRENCY_RE.sub('', value_str)  # Remove all non-numeric except . and -
     try:
         return float(value_str)
     except ValueError:
         logger.debug(f"Failed to parse currency: {value_str}")
         return 0.0
 
+def vectorized_parse_currency(s: pd.Series) -> pd.Series:
+    """Convert a column of currency strings to floats, using 0.0 where a value can't be parsed."""
+    if pd.api.types.is_numeric_dtype(s):
+        return s.astype(float).fillna(0.0)
+    cleaned = s.astype(str).str.replace(CURRENCY_RE, '', regex=True)  # Remove all non-numeric except . and -
+    return pd.to_numeric(cleaned, errors='coerce').fillna(0.0)
+
 def normalize_column_name(col: str) -> str:
     """Normalize column name to lowercase and remove special characters."""
     if not col:
         return ""
-    return re.sub(r'[^a-z0-9_]', '_', str(col).lower().strip())
+    return COLUMN_NAME_RE.sub('_', str(col).lower().strip())
 
 def load_csv_files(logger: logging.Logger) -> List[Dict]:
     """Load CSV files into policy dictionaries with premium parsing."""
@@ -202,7 +240,7 @@ def load_csv_files(logger: logging.Logger) -> List[Dict]:
                         # Special handling for premium (Charge Amount)
                         if field == 'premium':
                             raw_values = df[column_map[normalized_var]]
-                            mapped_df[field] = raw_values.apply(parse_currency)
+                            mapped_df[field] = vectorized_parse_currency(raw_values)
                             # Log raw and parsed values for debugging
                             for idx, (raw, parsed) in enumerate(zip(raw_values, mapped_df[field])):
                                 logger.debug(f"Policy {idx+1}: Raw {column_map[normalized_var]}='{raw}', Parsed premium={parsed}")
@@ -212,24 +250,24 @@ def load_csv_files(logger: logging.Logger) -> List[Dict]:
             
             # Parse dates
             if 'effective_date' in mapped_df:
-                mapped_df['effective_date'] = mapped_df['effective_date'].apply(parse_date)
-                mapped_df['expiration_date'] = mapped_df['effective_date'].apply(
-                    lambda x: (datetime.strptime(x, '%Y-%m-%d') + relativedelta(years=1)).strftime('%Y-%m-%d') if x else None
-                )
+                mapped_df['effective_date'] = vectorized_parse_date(mapped_df['effective_date'])
+                effective = pd.to_datetime(mapped_df['effective_date'], format='%Y-%m-%d', errors='coerce')
+                expiration = (effective + pd.DateOffset(years=1)).dt.strftime('%Y-%m-%d').astype(object)
+                mapped_df['expiration_date'] = expiration.where(effective.notna(), None)
                 mapped_df = mapped_df.dropna(subset=['effective_date'])
             
             # Parse other currency fields
             for col in ['broker_fee', 'commission']:
                 if col in mapped_df:
                     raw_values = mapped_df[col]
-                    mapped_df[f"{col}_amount"] = raw_values.apply(parse_currency)
+                    mapped_df[f"{col}_amount"] = vectorized_parse_currency(raw_values)
                     # Log currency parsing for debugging
                     for idx, (raw, parsed) in enumerate(zip(raw_values, mapped_df[f"{col}_amount"])):
                         logger.debug(f"Policy {idx+1}: Raw {col}='{raw}', Parsed {col}_amount={parsed}")
             
+            mapped_df['source_file'] = file_path.name
             file_policies = mapped_df.to_dict('records')
             for policy in file_policies:
-                policy['source_file'] = file_path.name
                 # Log complete policy data for debugging
                 logger.debug(f"Loaded policy from {file_path.name}:")
                 logger.debug(f"  Policy Number: {policy.get('policy_number', 'unknown')}")
@@ -246,12 +284,19 @@ def load_csv_files(logger: logging.Logger) -> List[Dict]:
     logger.info(f"Loaded {len(policies)} total policies")
     return policies
 
-async def fetch_ams_data(endpoint: str, doctype: str, fields: List[str], cache_file: Path, logger: logging.Logger, use_cache: bool) -> Dict:
-    """Fetch AMS data asynchronously with pagination and caching."""
+async def fetch_ams_data(endpoint: str, doctype: str, fields: List[str], cache_file: Path, logger: logging.Logger, use_cache: bool, keys_only: bool = False) -> Union[Dict, Set[str]]:
+    """Fetch AMS data asynchronously with pagination and caching.
+
+    With keys_only, only the set of lowercased key values is returned (for existence checks).
+    """
+    key_field = fields[0] if len(fields) == 1 else fields[1]
     if use_cache and cache_file.exists():
         try:
             df = pd.read_csv(cache_file)
-            key_field = fields[0] if len(fields) == 1 else fields[1]
+            if keys_only:
+                result = set(df[key_field].dropna().astype(str).str.lower())
+                logger.info(f"Loaded {len(result)} {doctype} keys from cache")
+                return result
             result = {str(row[key_field]).lower(): {k: row.get(k, 0.0) for k in fields} for _, row in df.iterrows() if pd.notna(row[key_field])}
             logger.info(f"Loaded {len(result)} {doctype}s from cache")
             return result
@@ -265,7 +310,8 @@ async def fetch_ams_data(endpoint: str, doctype: str, fields: List[str], cache_f
             try:
                 async with session.post(f"{AMS_API_URL}/frappe.client.get_list", json=payload, headers=AMS_API_HEADERS) as resp:
                     resp.raise_for_status()
-                    data = await resp.json()
+                    raw = await resp.read()
+                    data = json_loads(raw)
                     return data.get("message", [])
             except (aiohttp.ClientError, ValueError) as e:
                 if attempt < max_retries - 1:
@@ -289,10 +335,14 @@ async def fetch_ams_data(endpoint: str, doctype: str, fields: List[str], cache_f
     if all_items:
         df = pd.DataFrame(all_items)
         CACHE_DIR.mkdir(parents=True, exist_ok=True)
-        df.to_csv(cache_file, index=False)
+        # Write to a temporary file and rename so a killed process never leaves a truncated cache
+        tmp_file = cache_file.with_suffix(cache_file.suffix + '.tmp')
+        df.to_csv(tmp_file, index=False)
+        os.replace(tmp_file, cache_file)
         logger.info(f"Fetched and cached {len(all_items)} {doctype}s")
     
-    key_field = fields[0] if len(fields) == 1 else fields[1]
+    if keys_only:
+        return {str(item[key_field]).lower() for item in all_items if item.get(key_field)}
     return {str(item[key_field]).lower(): {k: item.get(k, 0.0) for k in fields} for item in all_items if item.get(key_field)}
 
 def clean_value(value: str, field_type: str = 'default') -> str:
@@ -496,6 +546,17 @@ def process_policies(policies: List[Dict], carriers_map: Dict, logger: logging.L
     logger.info(f"Processed {len(valid_policies)} valid, {len(invalid_policies)} invalid policies")
     return valid_policies, invalid_policies
 
+# Upload payload fields and the policy keys they are read from
+UPLOAD_PAYLOAD_KEYS = (
+    "policy_number", "effective_date", "expiration_date", "status", "premium", "broker",
+    "policy_type", "carrier", "commission_amount", "broker_fee", "insured"
+)
+UPLOAD_SOURCE_KEYS = (
+    "policy_number", "effective_date", "expiration_date", "status", "premium", "broker_email",
+    "policy_type", "carrier", "commission_amount", "broker_fee_amount", "insured"
+)
+get_upload_values = operator.itemgetter(*UPLOAD_SOURCE_KEYS)
+
 async def upload_to_ams(policies: List[Dict], logger: logging.Logger) -> int:
     """Upload policies asynchronously."""
     async def upload_one(session: aiohttp.ClientSession, policy: Dict) -> bool:
@@ -509,20 +570,8 @@ async def upload_to_ams(policies: List[Dict], logger: logging.Logger) -> int:
             policy["insured"] = policy.get("insured_name", "Unknown Insured")
             logger.warning(f"Using fallback insured name for policy {policy['policy_number']}")
         
-        payload = {
-            "doctype": "Policy", 
-            "policy_number": policy["policy_number"],
-            "effective_date": policy["effective_date"], 
-            "expiration_date": policy["expiration_date"],
-            "status": policy["status"], 
-            "premium": policy["premium"], 
-            "broker": policy["broker_email"],
-            "policy_type": policy["policy_type"], 
-            "carrier": policy["carrier"],
-            "commission_amount": policy["commission_amount"], 
-            "broker_fee": policy["broker_fee_amount"],
-            "insured": policy["insured"]  # Add insured field to payload
-        }
+        payload = dict(zip(UPLOAD_PAYLOAD_KEYS, get_upload_values(policy)))
+        payload["doctype"] = "Policy"
         max_retries, retry_delay = 3, 2
         for attempt in range(max_retries):
             try:
@@ -601,7 +650,7 @@ async def main():
     carriers_map = await fetch_ams_data("carriers", "Carrier", ["name", "carrier_name", "commission"], CACHE_DIR / "ams_carriers.csv", logger, not args.no_cache)
     
     valid_policies, invalid_policies = process_policies(policies, carriers_map, logger)
-    existing_policy_numbers = await fetch_ams_data("policies", "Policy", ["policy_number"], CACHE_DIR / "ams_policies.csv", logger, not args.skip_ams_fetch and not args.no_cache) if not args.skip_ams_fetch else {}
+    existing_policy_numbers = await fetch_ams_data("policies", "Policy", ["policy_number"], CACHE_DIR / "ams_policies.csv", logger, not args.skip_ams_fetch and not args.no_cache, keys_only=True) if not args.skip_ams_fetch else set()
     
     now = datetime.now().date()
     new_policies = [p for p in valid_policies if p["policy_number"] not in existing_policy_numbers and p["premium"] > 0 and datetime.strptime(p["expiration_date"], '%Y-%m-%d').date() > now]
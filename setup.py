@@ -7,10 +7,13 @@ setup(
     package_dir={"": "src"},
     install_requires=[
         "pandas",
-        "aiohttp",
+        "httpx[http2]",
         "requests",
         "python-dateutil"
     ],
+    extras_require={
+        "speedups": ["orjson", "pyahocorasick"]
+    },
     python_requires=">=3.8",
     entry_points={
         "console_scripts": [
@@ -22,6 +22,7 @@ logger = logging.getLogger('processing')
 
 async def main():
     """Main entry point."""
+    mapping_manager = None
     try:
         # Initialize paths
         project_root = Path(__file__).parent.parent.parent
@@ -46,31 +47,34 @@ async def main():
         
         # Initialize AMS client
         ams_client = AMSClient(cache_dir)
-        
-        # Load data from AMS
-        carriers_map = await ams_client.get_carriers()
-        insureds_map = await ams_client.get_insureds()
-        existing_policies = await ams_client.get_policies()
-        logger.info(f"Fetched {len(existing_policies)} existing policies from AMS")
-        
-        # Process policies
-        valid_policies, invalid_policies, results = process_policies(
-            policies=policies,
-            carriers_map=carriers_map,
-            insureds_map=insureds_map,
-            mappings=mappings,
-            mapping_manager=mapping_manager,
-            output_dir=output_dir,
-            logger=logger,
-            non_policy_types=non_policy_types,
-            non_carrier_entries=non_carrier_entries,
-            existing_policies=existing_policies
-        )
-        
-        # Upload valid policies to AMS
-        if valid_policies:
-            logger.info(f"Uploading {len(valid_policies)} valid policies to AMS")
-            await ams_client.upload_policies(valid_policies)
+        try:
+            # Load data from AMS
+            carriers_map = await ams_client.get_carriers()
+            insureds_map = await ams_client.get_insureds()
+            existing_policies = await ams_client.get_policies()
+            logger.info(f"Fetched {len(existing_policies)} existing policies from AMS")
+            
+            # Process policies
+            valid_policies, invalid_policies, results = process_policies(
+                policies=policies,
+                carriers_map=carriers_map,
+                insureds_map=insureds_map,
+                mappings=mappings,
+                mapping_manager=mapping_manager,
+                output_dir=output_dir,
+                logger=logger,
+                non_policy_types=non_policy_types,
+                non_carrier_entries=non_carrier_entries,
+                existing_policies=set(existing_policies)
+            )
+            
+            # Upload valid policies to AMS
+            if valid_policies:
+                logger.info(f"Uploading {len(valid_policies)} valid policies to AMS")
+                await ams_client.upload_policies(valid_policies)
+        finally:
+            # Always release the shared HTTP client, even if a step above failed
+            await ams_client.close()
         
         # Push to GitHub to preserve mapping files
         github_sync = GitHubSync.from_env()
@@ -86,6 +90,10 @@ async def main():
     except Exception as e:
         logger.error(f"Error during migration: {e}", exc_info=True)
         raise
+    finally:
+        # Save unmapped values tracked before a failure; a no-op after a normal run
+        if mapping_manager is not None:
+            mapping_manager.flush()
 
 if __name__ == '__main__':
     asyncio.run(main()) 
\ No newline at end of file
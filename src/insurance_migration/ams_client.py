@@ -4,17 +4,52 @@ Handles data fetching and uploading through the Frappe API.
 """
 
 import os
-import json
+import mmap
+import asyncio
 import logging
-import aiohttp
+import operator
+import httpx
 import pandas as pd
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set, Union
 from pathlib import Path
 from dotenv import load_dotenv
 
+from . import json_utils
+
 # Configure logger
 logger = logging.getLogger('ams')
 
+# Maximum number of concurrent requests sent to the AMS API
+MAX_CONCURRENT_REQUESTS = 20
+
+# Responses larger than this are decoded in a worker thread
+LARGE_RESPONSE_BYTES = 1024 * 1024
+
+# Policy payload fields and the policy keys they are read from
+_POLICY_PAYLOAD_KEYS = (
+    "effective_date", "expiration_date", "status", "premium", "broker",
+    "policy_type", "carrier", "commission_amount", "broker_fee"
+)
+_POLICY_SOURCE_KEYS = (
+    "effective_date", "expiration_date", "status", "premium", "broker_email",
+    "policy_type", "carrier", "commission_amount", "broker_fee_amount"
+)
+_get_policy_values = operator.itemgetter(*_POLICY_SOURCE_KEYS)
+_get_insured_values = operator.itemgetter("insured_name", "email")
+
+def _policy_payload(policy: Dict) -> Dict:
+    """Build the Policy payload shared by create and update calls."""
+    payload = dict(zip(_POLICY_PAYLOAD_KEYS, _get_policy_values(policy)))
+    payload["doctype"] = "Policy"
+    payload["name"] = policy["policy_number"]  # policy_number is the primary key
+    payload["insured"] = policy.get("insured_name")  # insured_name is the insured's primary key
+    
+    # Add endorsement_type field if it exists
+    endorsement_type = policy.get("endorsement_type")
+    if endorsement_type:
+        payload["endorsement_type"] = endorsement_type
+    return payload
+
 class AMSClient:
     """Client for interacting with the AMS API."""
     
@@ -48,6 +83,73 @@ class AMSClient:
         self._carriers_cache: Optional[Dict] = None
         self._insureds_cache: Optional[Dict] = None
         self._policies_cache: Optional[Dict] = None
+        
+        # Shared HTTP/2 client and concurrency limit, created on first request
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        
+        # In-flight create_insured requests keyed by lowercased insured name
+        self._insured_inflight: Dict[str, asyncio.Future] = {}
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """Get the shared HTTP/2 client, creating it if needed."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                headers=self.headers,
+                timeout=httpx.Timeout(30.0),
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+            )
+        return self._client
+    
+    async def close(self) -> None:
+        """Close the shared HTTP client."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def _post_with_retry(self, method: str, payload: Dict, description: str) -> Optional[httpx.Response]:
+        """POST to a Frappe API method, retrying on connection errors and 5xx responses.
+        
+        Args:
+            method: API method path, e.g. 'frappe.client.insert'
+            payload: JSON payload
+            description: Short description of the request for log messages
+        
+        Returns:
+            The last response received, or None if no response could be obtained
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        client = self._get_client()
+        url = f"{self.api_url}/{method}"
+        
+        resp = None
+        max_retries, retry_delay = 3, 2
+        for attempt in range(max_retries):
+            try:
+                async with self._semaphore:
+                    resp = await client.post(url, json=payload)
+                if resp.status_code < 500:
+                    return resp
+                logger.warning(f"{description} failed: {resp.status_code}")
+            except httpx.HTTPError as e:
+                if attempt == max_retries - 1:
+                    logger.error(f"{description} failed after retries: {e}")
+                    return resp
+                logger.warning(f"{description} failed: {e}. Retrying...")
+            if attempt < max_retries - 1:
+                await asyncio.sleep(retry_delay)
+                retry_delay *= 2
+        return resp
+    
+    @staticmethod
+    def _load_json_cache(cache_file: Path) -> Dict:
+        """Load a JSON cache file, parsing directly from a read-only memory map."""
+        with cache_file.open('rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                with memoryview(mm) as view:
+                    return json_utils.loads(view)
     
     async def get_carriers(self) -> Dict:
         """Get carriers from AMS or cache."""
@@ -55,8 +157,7 @@ class AMSClient:
             cache_file = self.cache_dir / 'carriers.json'
             if cache_file.exists():
                 try:
-                    with cache_file.open('r') as f:
-                        self._carriers_cache = json.load(f)
+                    self._carriers_cache = self._load_json_cache(cache_file)
                     logger.info(f"Loaded {len(self._carriers_cache)} carriers from cache")
                 except Exception as e:
                     logger.error(f"Error loading carriers cache: {e}")
@@ -74,8 +175,7 @@ class AMSClient:
             cache_file = self.cache_dir / 'insureds.json'
             if cache_file.exists():
                 try:
-                    with cache_file.open('r') as f:
-                        self._insureds_cache = json.load(f)
+                    self._insureds_cache = self._load_json_cache(cache_file)
                     logger.info(f"Loaded {len(self._insureds_cache)} insureds from cache")
                 except Exception as e:
                     logger.error(f"Error loading insureds cache: {e}")
@@ -93,8 +193,7 @@ class AMSClient:
             cache_file = self.cache_dir / 'policies.json'
             if cache_file.exists():
                 try:
-                    with cache_file.open('r') as f:
-                        self._policies_cache = json.load(f)
+                    self._policies_cache = self._load_json_cache(cache_file)
                     logger.info(f"Loaded {len(self._policies_cache)} policies from cache")
                 except Exception as e:
                     logger.error(f"Error loading policies cache: {e}")
@@ -107,15 +206,30 @@ class AMSClient:
         return self._policies_cache
     
     async def fetch_data(self, doctype: str, fields: List[str], cache_file: str, 
-                        use_cache: bool = True) -> Dict:
-        """Fetch data from AMS with caching support."""
+                        use_cache: bool = True, keys_only: bool = False) -> Union[Dict, Set[str]]:
+        """Fetch data from AMS with caching support.
+        
+        Args:
+            doctype: Frappe doctype to fetch
+            fields: Fields to fetch; the second field (or the only one) is the key
+            cache_file: Cache file name within the cache directory
+            use_cache: Whether to load from the cache file if it exists
+            keys_only: Return only the set of lowercased keys, for existence checks
+        
+        Returns:
+            Dictionary mapping lowercased keys to records, or a set of keys if keys_only
+        """
         cache_path = self.cache_dir / cache_file
+        key_field = fields[0] if len(fields) == 1 else fields[1]
         
         # Try to load from cache
         if use_cache and cache_path.exists():
             try:
                 df = pd.read_csv(cache_path)
-                key_field = fields[0] if len(fields) == 1 else fields[1]
+                if keys_only:
+                    result = set(df[key_field].dropna().astype(str).str.lower())
+                    logger.info(f"Loaded {len(result)} {doctype} keys from cache")
+                    return result
                 result = {
                     str(row[key_field]).lower(): {k: row.get(k, '') for k in fields}
                     for _, row in df.iterrows() if pd.notna(row[key_field])
@@ -126,50 +240,51 @@ class AMSClient:
                 logger.error(f"Cache load failed for {cache_file}: {e}")
 
         # Fetch from API
-        async def fetch_page(session: aiohttp.ClientSession, page: int, page_size: int) -> List[Dict]:
+        async def fetch_page(page: int, page_size: int) -> List[Dict]:
             payload = {
                 "doctype": doctype,
                 "fields": fields,
                 "limit_start": (page - 1) * page_size,
                 "limit_page_length": page_size
             }
-            max_retries, retry_delay = 3, 2
-            for attempt in range(max_retries):
-                try:
-                    async with session.post(
-                        f"{self.api_url}/frappe.client.get_list",
-                        json=payload,
-                        headers=self.headers
-                    ) as resp:
-                        resp.raise_for_status()
-                        data = await resp.json()
-                        return data.get("message", [])
-                except Exception as e:
-                    if attempt < max_retries - 1:
-                        logger.warning(f"Fetch failed for {doctype}, page {page}: {e}. Retrying...")
-                        await asyncio.sleep(retry_delay)
-                        retry_delay *= 2
-                    else:
-                        logger.error(f"Failed to fetch {doctype}: {e}")
-                        return []
+            resp = await self._post_with_retry(
+                "frappe.client.get_list", payload, f"Fetch {doctype} page {page}"
+            )
+            if resp is None:
+                return []
+            try:
+                resp.raise_for_status()
+                raw = resp.content
+                if len(raw) >= LARGE_RESPONSE_BYTES:
+                    # Decode off the event loop so other requests keep progressing
+                    data = await asyncio.get_running_loop().run_in_executor(None, json_utils.loads, raw)
+                else:
+                    data = json_utils.loads(raw)
+                return data.get("message", [])
+            except (httpx.HTTPStatusError, ValueError) as e:
+                logger.error(f"Failed to fetch {doctype}: {e}")
+                return []
 
         all_items = []
         page, page_size = 0, 1000
-        async with aiohttp.ClientSession() as session:
-            while True:
-                page += 1
-                items = await fetch_page(session, page, page_size)
-                all_items.extend(items)
-                if len(items) < page_size:
-                    break
+        while True:
+            page += 1
+            items = await fetch_page(page, page_size)
+            all_items.extend(items)
+            if len(items) < page_size:
+                break
 
-        # Cache results
+        # Cache results, writing to a temporary file first so an interrupted
+        # write never leaves a truncated cache behind
         if all_items:
             df = pd.DataFrame(all_items)
-            df.to_csv(cache_path, index=False)
+            tmp_path = cache_path.with_suffix(cache_path.suffix + '.tmp')
+            df.to_csv(tmp_path, index=False)
+            os.replace(tmp_path, cache_path)
             logger.info(f"Fetched and cached {len(all_items)} {doctype}s")
 
-        key_field = fields[0] if len(fields) == 1 else fields[1]
+        if keys_only:
+            return {str(item[key_field]).lower() for item in all_items if item.get(key_field)}
         return {
             str(item[key_field]).lower(): {k: item.get(k, '') for k in fields}
             for item in all_items if item.get(key_field)
@@ -193,121 +308,85 @@ class AMSClient:
             return False
 
     async def create_insured(self, insured: Dict) -> Optional[str]:
-        """Create a new insured in AMS and return their name."""
+        """Create a new insured in AMS and return their name.
+        
+        Concurrent calls for the same insured name share a single request, and
+        insureds created in this session are answered from the insureds cache.
+        """
+        insured_name = insured["insured_name"]
+        key = insured_name.lower()
+        if self._insureds_cache and key in self._insureds_cache:
+            return insured_name
+        
+        # Wait on the in-flight request for this insured if there is one
+        inflight = self._insured_inflight.get(key)
+        if inflight is not None:
+            return await inflight
+        
+        future = asyncio.get_running_loop().create_future()
+        self._insured_inflight[key] = future
+        name = None
+        try:
+            name = await self._insert_insured(insured)
+            if name and self._insureds_cache is not None:
+                self._insureds_cache[key] = {
+                    'name': name,
+                    'insured_name': name,
+                    'email': insured['email']
+                }
+            return name
+        finally:
+            del self._insured_inflight[key]
+            future.set_result(name)
+    
+    async def _insert_insured(self, insured: Dict) -> Optional[str]:
+        """Insert an insured through the API and return their name."""
+        insured_name, email = _get_insured_values(insured)
         payload = {
             "doctype": "Insured",
-            "name": insured["insured_name"],  # Using name as primary key
-            "insured_name": insured["insured_name"],
-            "email": insured["email"]
+            "name": insured_name,  # Using name as primary key
+            "insured_name": insured_name,
+            "email": email
         }
         
-        max_retries, retry_delay = 3, 2
-        for attempt in range(max_retries):
-            try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(
-                        f"{self.api_url}/frappe.client.insert",
-                        json=payload,
-                        headers=self.headers
-                    ) as resp:
-                        if resp.status == 200:
-                            logger.debug(f"Created insured: {insured['insured_name']}")
-                            return insured["insured_name"]
-                        elif resp.status == 409:  # Already exists
-                            logger.debug(f"Insured already exists: {insured['insured_name']}")
-                            return insured["insured_name"]
-                        logger.warning(f"Failed to create insured {insured['insured_name']}: {resp.status}")
-            except aiohttp.ClientError as e:
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(retry_delay)
-                    retry_delay *= 2
-                else:
-                    logger.error(f"Failed to create insured {insured['insured_name']} after retries: {e}")
+        resp = await self._post_with_retry("frappe.client.insert", payload, f"Create insured {insured_name}")
+        if resp is not None:
+            if resp.status_code == 200:
+                logger.debug(f"Created insured: {insured_name}")
+                return insured_name
+            elif resp.status_code == 409:  # Already exists
+                logger.debug(f"Insured already exists: {insured_name}")
+                return insured_name
+            logger.warning(f"Failed to create insured {insured_name}: {resp.status_code}")
         return None
 
     async def create_policy(self, policy: Dict) -> bool:
         """Create a new policy in AMS."""
-        payload = {
-            "doctype": "Policy",
-            "name": policy["policy_number"],  # Explicitly set name as the primary key
-            "policy_number": policy["policy_number"],
-            "effective_date": policy["effective_date"],
-            "expiration_date": policy["expiration_date"],
-            "status": policy["status"],
-            "premium": policy["premium"],
-            "broker": policy["broker_email"],
-            "policy_type": policy["policy_type"],
-            "carrier": policy["carrier"],
-            "commission_amount": policy["commission_amount"],
-            "broker_fee": policy["broker_fee_amount"],
-            "insured": policy.get("insured_name")  # Use insured_name directly as it's the primary key
-        }
-        
-        # Add endorsement_type field if it exists
-        if policy.get("endorsement_type"):
-            payload["endorsement_type"] = policy["endorsement_type"]
+        payload = _policy_payload(policy)
+        payload["policy_number"] = policy["policy_number"]
 
-        max_retries, retry_delay = 3, 2
-        for attempt in range(max_retries):
-            try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(
-                        f"{self.api_url}/frappe.client.insert",
-                        json=payload,
-                        headers=self.headers
-                    ) as resp:
-                        if resp.status == 200:
-                            logger.debug(f"Created policy: {policy['policy_number']}")
-                            return True
-                        logger.warning(f"Failed to create policy {policy['policy_number']}: {resp.status}")
-            except aiohttp.ClientError as e:
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(retry_delay)
-                    retry_delay *= 2
-                else:
-                    logger.error(f"Failed to create policy {policy['policy_number']} after retries: {e}")
+        resp = await self._post_with_retry(
+            "frappe.client.insert", payload, f"Create policy {policy['policy_number']}"
+        )
+        if resp is not None:
+            if resp.status_code == 200:
+                logger.debug(f"Created policy: {policy['policy_number']}")
+                return True
+            logger.warning(f"Failed to create policy {policy['policy_number']}: {resp.status_code}")
         return False
 
     async def update_policy(self, policy: Dict) -> bool:
         """Update an existing policy in AMS."""
-        payload = {
-            "doctype": "Policy",
-            "name": policy["policy_number"],  # Use policy_number as the name for updates
-            "effective_date": policy["effective_date"],
-            "expiration_date": policy["expiration_date"],
-            "status": policy["status"],
-            "premium": policy["premium"],
-            "broker": policy["broker_email"],
-            "policy_type": policy["policy_type"],
-            "carrier": policy["carrier"],
-            "commission_amount": policy["commission_amount"],
-            "broker_fee": policy["broker_fee_amount"],
-            "insured": policy.get("insured_name")  # Use insured_name directly as it's the primary key
-        }
-        
-        # Add endorsement_type field if it exists
-        if policy.get("endorsement_type"):
-            payload["endorsement_type"] = policy["endorsement_type"]
+        payload = _policy_payload(policy)
 
-        max_retries, retry_delay = 3, 2
-        for attempt in range(max_retries):
-            try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(
-                        f"{self.api_url}/frappe.client.set_value",
-                        json=payload,
-                        headers=self.headers
-                    ) as resp:
-                        if resp.status == 200:
-                            logger.debug(f"Updated policy: {policy['policy_number']}")
-                            return True
-                        logger.warning(f"Failed to update policy {policy['policy_number']}: {resp.status}")
-            except aiohttp.ClientError as e:
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(retry_delay)
-                    retry_delay *= 2
-                else:
-                    logger.error(f"Failed to update policy {policy['policy_number']} after retries: {e}")
+        resp = await self._post_with_retry(
+            "frappe.client.set_value", payload, f"Update policy {policy['policy_number']}"
+        )
+        if resp is not None:
+            if resp.status_code == 200:
+                logger.debug(f"Updated policy: {policy['policy_number']}")
+                return True
+            logger.warning(f"Failed to update policy {policy['policy_number']}: {resp.status_code}")
         return False
 
     @classmethod
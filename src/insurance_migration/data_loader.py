@@ -6,14 +6,34 @@ Handles CSV file loading and initial data transformation.
 import pandas as pd
 import logging
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 import re
+import os
+from concurrent.futures import ProcessPoolExecutor
 
 # Configure logger
 logger = logging.getLogger('processing')
 
+# Amount columns whose missing values are None rather than an empty string
+NULLABLE_COLUMNS = {'premium', 'broker_fee', 'commission_amount'}
+
+# Number of CSV rows read and converted at a time
+CSV_CHUNK_SIZE = 100_000
+
+# Precompiled patterns for currency and column name cleanup
+_CURRENCY_RE = re.compile(r'[^\d.-]')
+_UNDERSCORES_RE = re.compile(r'_+')
+
+class _ColumnNameTable(dict):
+    """str.translate table mapping every character outside a-z0-9 to an underscore."""
+    def __missing__(self, codepoint: int) -> str:
+        self[codepoint] = '_'
+        return '_'
+
+_COLUMN_NAME_TABLE = _ColumnNameTable((ord(c), c) for c in 'abcdefghijklmnopqrstuvwxyz0123456789')
+
 def parse_date(date_str: str) -> Optional[str]:
     """Parse date string with multiple formats."""
     if pd.isna(date_str) or not date_str:
@@ -37,7 +57,7 @@ def parse_currency(value: any) -> float:
     value_str = str(value).strip()
     if not value_str:
         return 0.0
-    value_str = re.sub(r'[^\d.-]', '', value_str)  # Remove all non-numeric except . and -
+    value_str = _CURRENCY_RE.sub('', value_str)  # Remove all non-numeric except . and -
     try:
         return float(value_str)
     except ValueError:
@@ -48,108 +68,185 @@ def normalize_column_name(col: str) -> str:
     """Normalize column name to lowercase and remove special characters."""
     if not col:
         return ""
-    col = str(col).lower().strip()
-    col = re.sub(r'[^a-z0-9]', ' ', col)  # Replace non-alphanumeric with space
-    col = re.sub(r'\s+', ' ', col).strip()  # Normalize spaces
-    col = col.replace(' ', '_')  # Replace spaces with underscores
-    return col
+    col = str(col).lower().translate(_COLUMN_NAME_TABLE)  # Replace non-alphanumeric with underscore
+    return _UNDERSCORES_RE.sub('_', col).strip('_')  # Collapse and trim underscores
+
+# Required and optional fields with their column name variations, in order of preference
+REQUIRED_FIELDS = {
+    'policy_number': ['policy_number', 'policy_no', 'policy_id', 'policy'],
+    'insured_name': ['insured_name', 'insured', 'customer_name', 'client_name', 'policyholder', 'client']
+}
+OPTIONAL_FIELDS = {
+    'effective_date': ['effective_date', 'start_date', 'policy_date', 'date'],
+    'broker_fee': ['broker_fee', 'broker_fee_amount', 'brokerfee'],
+    'commission': ['commission', 'commission_amount', 'comm'],
+    'broker': ['agent', 'broker', 'agent_name', 'broker_name'],
+    'policy_type': ['policy_type', 'type', 'policy_category', 'policy type'],
+    'carrier': ['carrier', 'carrier_name', 'insurance_company'],
+    'premium': ['charge_amount', 'premium', 'amount', 'policy_amount', 'total_premium', 'premium_amount']
+}
+
+# Variations normalized once at import rather than for every file
+_FIELD_VARIATIONS = {
+    target: [normalize_column_name(var) for var in variations]
+    for target, variations in {**REQUIRED_FIELDS, **OPTIONAL_FIELDS}.items()
+}
 
-def load_csv_files(input_dir: Path, logger: logging.Logger) -> List[Dict[str, Any]]:
+def _load_single_csv(csv_file: Path) -> Tuple[Optional[pd.DataFrame], List[Tuple[int, str]]]:
+    """
+    Load and parse a single CSV file.
+    
+    Runs in a worker process, so log records are returned to the caller
+    instead of being written to the logger directly.
+    
+    Args:
+        csv_file: Path to the CSV file
+    
+    Returns:
+        Tuple of (DataFrame or None if the file was skipped, list of (level, message) log records)
+    """
+    messages = []
+    try:
+        # Read only the header and normalize column names
+        header = pd.read_csv(csv_file, nrows=0).columns
+        normalized_columns = [normalize_column_name(col) for col in header]
+        
+        # Map each field to the first of its variations present in the file
+        available = set(normalized_columns)
+        column_map = {}
+        for target, variations in _FIELD_VARIATIONS.items():
+            match = next((var for var in variations if var in available), None)
+            if match is not None:
+                column_map[target] = match
+        
+        # Check for missing required fields
+        missing_required = [field for field in REQUIRED_FIELDS if field not in column_map]
+        if missing_required:
+            messages.append((logging.ERROR, f"Missing required columns in {csv_file.name}: {missing_required}"))
+            return None, messages
+        
+        # Standardized column names after renaming
+        renames = {v: k for k, v in column_map.items()}
+        columns = [renames.get(col, col) for col in normalized_columns]
+        
+        # Headers such as "Premium" and "premium" end up with the same name; keep the
+        # last of each, as converting rows to dictionaries used to
+        keep = ~pd.Index(columns).duplicated(keep='last')
+        if not keep.all():
+            duplicates = sorted({col for col, kept in zip(columns, keep) if not kept})
+            messages.append((logging.WARNING, f"Duplicate columns in {csv_file.name} after normalization, keeping the last of each: {duplicates}"))
+        
+        # Parse date columns while reading instead of in a separate pass
+        date_columns = ['effective_date', 'expiration_date', 'transaction_date']
+        parse_dates = [orig for orig, col in zip(header, columns) if col in date_columns]
+        
+        # Read in chunks to bound memory; files are already parsed in parallel processes
+        # Date problems are tallied across chunks and reported once per column
+        frames = []
+        invalid_dates = {}
+        date_errors = {}
+        insured_warnings = []
+        for df in pd.read_csv(csv_file, parse_dates=parse_dates, chunksize=CSV_CHUNK_SIZE):
+            df.columns = columns
+            df = df.loc[:, keep]
+            
+            # Coerce date columns the reader could not parse as a whole
+            for col in date_columns:
+                if col in df.columns:
+                    try:
+                        if not pd.api.types.is_datetime64_any_dtype(df[col]):
+                            df[col] = pd.to_datetime(df[col], errors='coerce')
+                        invalid_dates[col] = invalid_dates.get(col, 0) + df[col].isna().sum()
+                    except Exception as e:
+                        date_errors.setdefault(col, f"Error converting dates in column {col}: {e}")
+            
+            # Ensure required fields are not empty
+            has_insured = df['insured_name'].fillna('').astype(bool)
+            for policy_number in df.loc[~has_insured, 'policy_number']:
+                insured_warnings.append((logging.WARNING, f"Empty insured_name for policy {policy_number} in {csv_file.name}"))
+            frames.append(df[has_insured])
+        
+        for col in date_columns:
+            if col in date_errors:
+                messages.append((logging.ERROR, date_errors[col]))
+            elif invalid_dates.get(col, 0) > 0:
+                messages.append((logging.WARNING, f"Skipped {invalid_dates[col]} rows with invalid dates in {csv_file.name}"))
+        messages.extend(insured_warnings)
+        
+        # A file with a header but no data rows yields no chunks
+        policies = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=pd.Index(columns)[keep])
+        messages.append((logging.DEBUG, f"Loaded {len(policies)} policies from {csv_file.name}"))
+        return policies, messages
+        
+    except Exception as e:
+        messages.append((logging.ERROR, f"Error loading {csv_file.name}: {e}"))
+        return None, messages
+
+def _missing_value(column: str) -> Optional[str]:
+    """Value used for missing entries: None for amount columns, empty string otherwise."""
+    return None if column in NULLABLE_COLUMNS else ''
+
+def load_csv_files(input_dir: Path, logger: logging.Logger) -> pd.DataFrame:
     """
     Load and parse CSV files from input directory.
     
+    Files are parsed in parallel worker processes when there is more than one.
+    
     Args:
         input_dir: Directory containing CSV files
         logger: Logger instance
     
     Returns:
-        List of policy dictionaries
+        DataFrame with one row per policy; use policies_to_records for a list of dictionaries
     """
-    policies = []
     csv_files = list(input_dir.glob('*.csv'))
     
     if not csv_files:
         logger.warning(f"No CSV files found in {input_dir}")
-        return policies
+        return pd.DataFrame()
     
     logger.info(f"Found {len(csv_files)} CSV files to process")
     
-    for csv_file in csv_files:
-        try:
-            # Read CSV file
-            df = pd.read_csv(csv_file)
-            
-            # Normalize column names
-            df.columns = [normalize_column_name(col) for col in df.columns]
-            
-            # Define required and optional fields with their variations
-            required = {
-                'policy_number': ['policy_number', 'policy_no', 'policy_id', 'policy'],
-                'insured_name': ['insured_name', 'insured', 'customer_name', 'client_name', 'policyholder', 'client']
-            }
-            optional = {
-                'effective_date': ['effective_date', 'start_date', 'policy_date', 'date'],
-                'broker_fee': ['broker_fee', 'broker_fee_amount', 'brokerfee'],
-                'commission': ['commission', 'commission_amount', 'comm'],
-                'broker': ['agent', 'broker', 'agent_name', 'broker_name'],
-                'policy_type': ['policy_type', 'type', 'policy_category', 'policy type'],
-                'carrier': ['carrier', 'carrier_name', 'insurance_company'],
-                'premium': ['charge_amount', 'premium', 'amount', 'policy_amount', 'total_premium', 'premium_amount']
-            }
-            
-            # Create a mapping of normalized column names
-            column_map = {}
-            for target, variations in {**required, **optional}.items():
-                for var in variations:
-                    normalized = normalize_column_name(var)
-                    if normalized in df.columns:
-                        column_map[target] = normalized
-                        break
-            
-            # Check for missing required fields
-            missing_required = [field for field in required.keys() if field not in column_map]
-            if missing_required:
-                logger.error(f"Missing required columns in {csv_file.name}: {missing_required}")
-                continue
-            
-            # Rename columns to standardized names
-            df = df.rename(columns={v: k for k, v in column_map.items()})
-            
-            # Convert date columns
-            date_columns = ['effective_date', 'expiration_date', 'transaction_date']
-            for col in date_columns:
-                if col in df.columns:
-                    try:
-                        df[col] = pd.to_datetime(df[col], errors='coerce')
-                        invalid_dates = df[col].isna().sum()
-                        if invalid_dates > 0:
-                            logger.warning(f"Skipped {invalid_dates} rows with invalid dates in {csv_file.name}")
-                    except Exception as e:
-                        logger.error(f"Error converting dates in column {col}: {e}")
-            
-            # Convert DataFrame to list of dictionaries
-            file_policies = df.to_dict('records')
-            
-            # Clean up NaN values and ensure required fields are not empty
-            for policy in file_policies:
-                for key, value in policy.items():
-                    if pd.isna(value):
-                        policy[key] = None if key in ['premium', 'broker_fee', 'commission_amount'] else ''
-                
-                # Ensure required fields are not empty
-                if not policy.get('insured_name'):
-                    logger.warning(f"Empty insured_name for policy {policy.get('policy_number')} in {csv_file.name}")
-                    continue
-                
-                policies.append(policy)
-            
-            logger.debug(f"Loaded {len(file_policies)} policies from {csv_file.name}")
-            
-        except Exception as e:
-            logger.error(f"Error loading {csv_file.name}: {e}")
-            continue
+    if len(csv_files) > 1:
+        with ProcessPoolExecutor(max_workers=min(len(csv_files), os.cpu_count() or 1)) as executor:
+            results = list(executor.map(_load_single_csv, csv_files))
+    else:
+        results = [_load_single_csv(csv_files[0])]
+    
+    frames = []
+    for df, messages in results:
+        for level, message in messages:
+            logger.log(level, message)
+        if df is not None:
+            frames.append(df)
+    
+    if not frames:
+        return pd.DataFrame()
     
-    return policies
+    # Replace missing values per file, before concatenating, so columns missing
+    # from one file do not widen another file's integer columns to float
+    columns = list(dict.fromkeys(col for df in frames for col in df.columns))
+    for i, df in enumerate(frames):
+        for col in df.columns[df.isna().any()]:
+            df[col] = df[col].astype(object).where(df[col].notna(), _missing_value(col))
+        for col in columns:
+            if col not in df.columns:
+                df[col] = pd.Series([_missing_value(col)] * len(df), index=df.index, dtype=object)
+        frames[i] = df[columns]
+    
+    return pd.concat(frames, ignore_index=True)
+
+def policies_to_records(policies: pd.DataFrame) -> List[Dict[str, Any]]:
+    """
+    Convert a policies DataFrame to a list of policy dictionaries.
+    
+    Args:
+        policies: DataFrame returned by load_csv_files
+    
+    Returns:
+        List of policy dictionaries
+    """
+    return policies.to_dict('records')
 
 def policies_to_dataframe(policies: List[Dict[str, Any]]) -> pd.DataFrame:
     """
@@ -5,17 +5,30 @@ Handles pushing updates to GitHub repository.
 
 import os
 import base64
+import fnmatch
+import hashlib
 import logging
+import mmap
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
+import re
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Set
+from typing import Dict, Optional, Pattern, Set, Tuple
 
 # Configure logger
 logger = logging.getLogger('processing')
 
+# Branch that pushes are committed to
+BRANCH = "main"
+
+# Number of blobs uploaded concurrently
+MAX_BLOB_WORKERS = 16
+
 class GitHubSync:
     def __init__(self, username: str, token: str, repo_name: str):
         """Initialize GitHub sync with credentials."""
@@ -26,18 +39,27 @@ class GitHubSync:
         }
         self.repo_name = repo_name
         self.api_url = "https://api.github.com"
+        
+        # Pooled keep-alive session shared by all API calls, retrying connection errors
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(
+            pool_connections=MAX_BLOB_WORKERS,
+            pool_maxsize=MAX_BLOB_WORKERS,
+            max_retries=Retry(total=3, backoff_factor=0.3)
+        )
+        self.session.mount("https://", adapter)
+        
+        # Remote path -> blob SHA for the branch, loaded by load_tree_cache
+        self._tree_cache: Dict[str, str] = {}
     
     def ensure_repository(self) -> bool:
         """Ensure repository exists, create if needed."""
-        resp = requests.get(
-            f"{self.api_url}/repos/{self.username}/{self.repo_name}",
-            headers=self.headers
-        )
+        resp = self.session.get(f"{self.api_url}/repos/{self.username}/{self.repo_name}")
         
         if resp.status_code == 404:
-            resp = requests.post(
+            resp = self.session.post(
                 f"{self.api_url}/user/repos",
-                headers=self.headers,
                 json={"name": self.repo_name, "private": False}
             )
             if resp.status_code not in {200, 201}:
@@ -50,35 +72,54 @@ class GitHubSync:
         
         return True
     
+    def load_tree_cache(self) -> None:
+        """Load the SHAs of all files on the branch with a single recursive tree request."""
+        resp = self.session.get(
+            f"{self.api_url}/repos/{self.username}/{self.repo_name}/git/trees/{BRANCH}",
+            params={"recursive": "1"}
+        )
+        if resp.status_code != 200:
+            # Empty repository or missing branch: nothing to cache
+            self._tree_cache = {}
+            return
+        
+        data = resp.json()
+        if data.get("truncated"):
+            logger.warning("Repository tree is truncated, some remote files will not be cached")
+        self._tree_cache = {
+            entry["path"]: entry["sha"]
+            for entry in data.get("tree", [])
+            if entry.get("type") == "blob"
+        }
+        logger.debug(f"Cached {len(self._tree_cache)} remote file SHAs")
+    
     def push_file(self, local_path: Path, remote_path: str) -> bool:
-        """Push a single file to GitHub."""
+        """Push a single file to GitHub using SHAs from the tree cache."""
         if not local_path.exists():
             logger.debug(f"Skipping {local_path} (not found)")
             return True
         
         try:
-            with local_path.open('rb') as f:
-                content = base64.b64encode(f.read()).decode('utf-8')
+            # Only hash the local file when there is a remote version to compare with
+            sha = self._tree_cache.get(remote_path)
+            if sha is not None and sha == self._git_blob_sha(local_path):
+                logger.debug(f"Skipping {remote_path} (unchanged)")
+                return True
             
-            # Check if file exists to determine if we need to update or create
-            resp = requests.get(
-                f"{self.api_url}/repos/{self.username}/{self.repo_name}/contents/{remote_path}",
-                headers=self.headers
-            )
+            content = self._encode_file(local_path)
             
             payload = {
                 "message": f"Update {remote_path}",
                 "content": content,
-                "branch": "main"
+                "branch": BRANCH
             }
             
             # If file exists, we need to include the SHA
-            if resp.status_code == 200:
-                payload["sha"] = resp.json()["sha"]
+            if sha:
+                payload["sha"] = sha
             
-            resp = requests.put(
+            resp = self.session.put(
                 f"{self.api_url}/repos/{self.username}/{self.repo_name}/contents/{remote_path}",
-                headers=self.headers,
                 json=payload
             )
             
@@ -86,6 +127,7 @@ class GitHubSync:
                 logger.error(f"Failed to push {remote_path}: {resp.status_code}")
                 return False
             
+            self._tree_cache[remote_path] = resp.json()["content"]["sha"]
             logger.debug(f"Pushed {remote_path}")
             return True
             
@@ -93,6 +135,125 @@ class GitHubSync:
             logger.error(f"Error pushing {remote_path}: {e}")
             return False
     
+    def create_blob(self, local_path: Path, remote_path: str) -> Optional[str]:
+        """Upload a single file as a Git blob and return its SHA."""
+        try:
+            content = self._encode_file(local_path)
+            
+            resp = self.session.post(
+                f"{self.api_url}/repos/{self.username}/{self.repo_name}/git/blobs",
+                json={"content": content, "encoding": "base64"}
+            )
+            
+            if resp.status_code != 201:
+                logger.error(f"Failed to create blob for {remote_path}: {resp.status_code}")
+                return None
+            
+            logger.debug(f"Created blob for {remote_path}")
+            return resp.json()["sha"]
+            
+        except Exception as e:
+            logger.error(f"Error creating blob for {remote_path}: {e}")
+            return None
+    
+    def push_files(self, files_to_push: Dict[Path, str], message: str) -> bool:
+        """
+        Push files to GitHub as a single commit using the Git Data API.
+        
+        Blobs are uploaded in parallel, then one tree and one commit are created
+        and the branch is moved to it. Falls back to pushing files one at a time
+        through the Contents API when the branch does not exist yet.
+        
+        Args:
+            files_to_push: Dictionary mapping local paths to remote paths
+            message: Commit message
+        
+        Returns:
+            True if successful, False otherwise
+        """
+        repo_url = f"{self.api_url}/repos/{self.username}/{self.repo_name}"
+        files_to_push = {local: remote for local, remote in files_to_push.items() if local.exists()}
+        
+        # Skip files whose content matches the blob already on the branch; files
+        # not on the branch are pushed without hashing them
+        files_to_push = {
+            local: remote for local, remote in files_to_push.items()
+            if remote not in self._tree_cache or self._tree_cache[remote] != self._git_blob_sha(local)
+        }
+        if not files_to_push:
+            logger.info("No changed files to push")
+            return True
+        logger.info(f"Pushing {len(files_to_push)} changed files")
+        
+        # Get the current head of the branch
+        resp = self.session.get(f"{repo_url}/git/ref/heads/{BRANCH}")
+        if resp.status_code in {404, 409}:
+            # Empty repository: the Contents API creates the initial commit. Files are
+            # pushed one at a time since concurrent commits to one branch conflict.
+            logger.info(f"Branch {BRANCH} not found, pushing files individually")
+            success = True
+            for i, (local_path, remote_path) in enumerate(files_to_push.items(), 1):
+                logger.info(f"Pushing file {i}/{len(files_to_push)}: {remote_path}")
+                if not self.push_file(local_path, remote_path):
+                    success = False
+            return success
+        if resp.status_code != 200:
+            logger.error(f"Failed to get branch {BRANCH}: {resp.status_code}")
+            return False
+        parent_sha = resp.json()["object"]["sha"]
+        
+        resp = self.session.get(f"{repo_url}/git/commits/{parent_sha}")
+        if resp.status_code != 200:
+            logger.error(f"Failed to get commit {parent_sha}: {resp.status_code}")
+            return False
+        base_tree_sha = resp.json()["tree"]["sha"]
+        
+        # Upload blobs in parallel
+        with ThreadPoolExecutor(max_workers=MAX_BLOB_WORKERS) as executor:
+            blob_shas = list(executor.map(self.create_blob, files_to_push.keys(), files_to_push.values()))
+        if None in blob_shas:
+            return False
+        
+        # Create the tree and commit, then move the branch; executable files keep their mode
+        tree = [
+            {
+                "path": remote_path,
+                "mode": "100755" if os.access(local_path, os.X_OK) else "100644",
+                "type": "blob",
+                "sha": sha
+            }
+            for (local_path, remote_path), sha in zip(files_to_push.items(), blob_shas)
+        ]
+        resp = self.session.post(
+            f"{repo_url}/git/trees",
+            json={"base_tree": base_tree_sha, "tree": tree}
+        )
+        if resp.status_code != 201:
+            logger.error(f"Failed to create tree: {resp.status_code}")
+            return False
+        tree_sha = resp.json()["sha"]
+        
+        resp = self.session.post(
+            f"{repo_url}/git/commits",
+            json={"message": message, "tree": tree_sha, "parents": [parent_sha]}
+        )
+        if resp.status_code != 201:
+            logger.error(f"Failed to create commit: {resp.status_code}")
+            return False
+        commit_sha = resp.json()["sha"]
+        
+        resp = self.session.patch(
+            f"{repo_url}/git/refs/heads/{BRANCH}",
+            json={"sha": commit_sha}
+        )
+        if resp.status_code != 200:
+            logger.error(f"Failed to update branch {BRANCH}: {resp.status_code}")
+            return False
+        
+        self._tree_cache.update((entry["path"], entry["sha"]) for entry in tree)
+        logger.debug(f"Committed {len(tree)} files as {commit_sha}")
+        return True
+    
     def push_to_github(self, project_root: Path, dry_run: bool = False) -> bool:
         """
         Push the entire project to GitHub, preserving critical mapping files.
@@ -106,6 +267,7 @@ class GitHubSync:
         """
         if not self.ensure_repository():
             return False
+        self.load_tree_cache()
         
         # Create .gitignore if it doesn't exist
         gitignore_path = project_root / '.gitignore'
@@ -164,22 +326,16 @@ Thumbs.db
         
         # Create timestamp for commit message
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        commit_message = f"Preserve critical mapping files and update project - {timestamp}"
         
-        # Push each file
-        success = True
-        total_files = len(files_to_push)
-        logger.info(f"Pushing {total_files} files to GitHub")
-        
-        for i, (local_path, remote_path) in enumerate(files_to_push.items(), 1):
-            logger.info(f"Pushing file {i}/{total_files}: {remote_path}")
-            if not self.push_file(local_path, remote_path):
-                success = False
+        # Push all files in a single commit
+        logger.info(f"Pushing {len(files_to_push)} files to GitHub")
+        success = self.push_files(files_to_push, commit_message)
         
         if success:
             logger.info(f"Successfully pushed project to GitHub: https://github.com/{self.username}/{self.repo_name}")
             
             # Create a commit message file to document the push
-            commit_message = f"Preserve critical mapping files and update project - {timestamp}"
             commit_file = project_root / 'data' / 'reports' / 'last_github_commit.json'
             commit_file.parent.mkdir(parents=True, exist_ok=True)
             
@@ -204,7 +360,7 @@ Thumbs.db
             Dictionary mapping local paths to remote paths
         """
         files_to_push = {}
-        ignored_patterns = self._parse_gitignore(project_root)
+        ignore_re, prune_re = self._parse_gitignore(project_root)
         
         # Critical mapping files that must be included
         critical_files = [
@@ -214,35 +370,42 @@ Thumbs.db
             'data/mappings/unmatched_values.json'
         ]
         
-        # Add all files in the project
-        for path in project_root.glob('**/*'):
-            # Skip directories
-            if path.is_dir():
-                continue
+        # Add all files in the project, skipping directories whose contents are all ignored
+        for dirpath, dirnames, filenames in os.walk(project_root):
+            rel_dir = os.path.relpath(dirpath, project_root).replace('\\', '/')
+            prefix = '' if rel_dir == '.' else f"{rel_dir}/"
             
-            # Get relative path
-            rel_path = path.relative_to(project_root)
-            str_path = str(rel_path).replace('\\', '/')
+            dirnames[:] = [
+                d for d in dirnames
+                if not self._is_ignored(f"{prefix}{d}/", prune_re)
+                or any(f.startswith(f"{prefix}{d}/") for f in critical_files)
+            ]
             
-            # Skip ignored files unless they're critical
-            if str_path in critical_files or not self._is_ignored(str_path, ignored_patterns):
-                files_to_push[path] = str_path
+            for filename in filenames:
+                str_path = f"{prefix}{filename}"
+                
+                # Skip ignored files unless they're critical
+                if str_path in critical_files or not self._is_ignored(str_path, ignore_re):
+                    files_to_push[Path(dirpath) / filename] = str_path
         
         return files_to_push
     
-    def _parse_gitignore(self, project_root: Path) -> List[str]:
+    def _parse_gitignore(self, project_root: Path) -> Tuple[Optional[Pattern], Optional[Pattern]]:
         """
-        Parse .gitignore file.
+        Parse .gitignore file into compiled regexes.
+        
+        The second pattern matches directory paths (with a trailing /) whose
+        contents are all ignored, so the walk can skip them entirely.
         
         Args:
             project_root: Root directory of the project
         
         Returns:
-            List of ignore patterns
+            Tuple of (file ignore pattern, directory prune pattern); None where there are no patterns
         """
         gitignore_path = project_root / '.gitignore'
         if not gitignore_path.exists():
-            return []
+            return None, None
         
         patterns = []
         with gitignore_path.open('r') as f:
@@ -255,30 +418,52 @@ Thumbs.db
                         continue
                     patterns.append(line)
         
-        return patterns
+        if not patterns:
+            return None, None
+        
+        # One alternative per glob, plus a prefix match for directory patterns (ending with /)
+        prefixes = [re.escape(pattern[:-1]) for pattern in patterns if pattern.endswith('/')]
+        alternatives = [fnmatch.translate(pattern) for pattern in patterns] + prefixes
+        
+        # A directory can be pruned when a prefix matches it, or a glob ending in *
+        # matches it, since every path below it then matches as well
+        prune_alternatives = [fnmatch.translate(pattern) for pattern in patterns if pattern.endswith('*')] + prefixes
+        
+        flags = re.IGNORECASE if os.path.normcase('A') == 'a' else 0
+        ignore_re = re.compile('|'.join(f'(?:{alt})' for alt in alternatives), flags)
+        prune_re = re.compile('|'.join(f'(?:{alt})' for alt in prune_alternatives), flags) if prune_alternatives else None
+        return ignore_re, prune_re
     
-    def _is_ignored(self, path: str, patterns: List[str]) -> bool:
+    def _is_ignored(self, path: str, ignore_re: Optional[Pattern]) -> bool:
         """
         Check if a path is ignored by .gitignore patterns.
         
         Args:
             path: Path to check
-            patterns: List of ignore patterns
+            ignore_re: Compiled ignore pattern from _parse_gitignore
         
         Returns:
             True if the path is ignored, False otherwise
         """
-        import fnmatch
-        
-        for pattern in patterns:
-            if fnmatch.fnmatch(path, pattern):
-                return True
-            
-            # Handle directory patterns (ending with /)
-            if pattern.endswith('/') and path.startswith(pattern[:-1]):
-                return True
-        
-        return False
+        return ignore_re is not None and ignore_re.match(path) is not None
+    
+    @staticmethod
+    def _git_blob_sha(local_path: Path) -> str:
+        """Compute the Git blob SHA-1 of a file, matching the SHAs in the remote tree."""
+        h = hashlib.sha1(f"blob {local_path.stat().st_size}\0".encode())
+        with local_path.open('rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(chunk)
+        return h.hexdigest()
+    
+    @staticmethod
+    def _encode_file(local_path: Path) -> str:
+        """Base64-encode a file straight from a memory map instead of reading it into a buffer."""
+        with local_path.open('rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return ''
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return base64.b64encode(mm).decode('ascii')
     
     @classmethod
     def from_env(cls) -> Optional['GitHubSync']:
@@ -3,11 +3,20 @@ Logging configuration for the insurance policy migration system.
 Provides separate loggers for processing and AMS operations.
 """
 
+import atexit
 import logging
+import logging.handlers
+import queue
 from pathlib import Path
 
 def setup_loggers() -> tuple[logging.Logger, logging.Logger]:
-    """Configure and return processing and AMS loggers."""
+    """
+    Configure and return processing and AMS loggers.
+    
+    Both loggers only put records on an in-memory queue; a background listener
+    thread formats them and writes them to the log files and console. The
+    listener is stopped, flushing pending records, at interpreter exit.
+    """
     # Ensure logs directory exists
     Path("logs").mkdir(exist_ok=True)
     
@@ -18,31 +27,41 @@ def setup_loggers() -> tuple[logging.Logger, logging.Logger]:
     # Simple format for console output
     console_formatter = logging.Formatter('%(levelname)s: %(message)s')
     
-    # Setup processing logger
-    processing_logger = logging.getLogger('processing')
-    processing_logger.setLevel(logging.DEBUG)
-    
     # File handler for processing logs
     proc_file_handler = logging.FileHandler('logs/processing.log', mode='w')
     proc_file_handler.setLevel(logging.DEBUG)
     proc_file_handler.setFormatter(detailed_formatter)
-    processing_logger.addHandler(proc_file_handler)
-    
-    # Setup AMS logger
-    ams_logger = logging.getLogger('ams')
-    ams_logger.setLevel(logging.DEBUG)
+    proc_file_handler.addFilter(logging.Filter('processing'))
     
     # File handler for AMS logs
     ams_file_handler = logging.FileHandler('logs/ams.log', mode='w')
     ams_file_handler.setLevel(logging.DEBUG)
     ams_file_handler.setFormatter(detailed_formatter)
-    ams_logger.addHandler(ams_file_handler)
+    ams_file_handler.addFilter(logging.Filter('ams'))
     
     # Console handler for both loggers (INFO level)
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.DEBUG)
     console_handler.setFormatter(console_formatter)
-    processing_logger.addHandler(console_handler)
-    ams_logger.addHandler(console_handler)
     
-    return processing_logger, ams_logger 
\ No newline at end of file
+    # Background listener writing queued records to the handlers
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(
+        log_queue, proc_file_handler, ams_file_handler, console_handler,
+        respect_handler_level=True
+    )
+    listener.start()
+    atexit.register(listener.stop)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    
+    # Setup processing logger
+    processing_logger = logging.getLogger('processing')
+    processing_logger.setLevel(logging.DEBUG)
+    processing_logger.addHandler(queue_handler)
+    
+    # Setup AMS logger
+    ams_logger = logging.getLogger('ams')
+    ams_logger.setLevel(logging.DEBUG)
+    ams_logger.addHandler(queue_handler)
+    
+    return processing_logger, ams_logger
@@ -3,11 +3,13 @@ Mapping manager for insurance policy migration.
 Handles loading, saving, and updating mapping files.
 """
 
-import json
 import logging
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Set, Tuple, List, Optional
+from typing import Dict, FrozenSet, Set, Tuple, List, Optional
+
+from . import json_utils
 
 # Configure logger
 logger = logging.getLogger('processing')
@@ -36,9 +38,14 @@ class MappingManager:
         self.carrier_mapping: Dict[str, str] = {}
         self.policy_type_mapping: Dict[str, str] = {}
         
-        # Initialize exclusion sets
-        self.non_policy_types: Set[str] = set()
-        self.non_carrier_entries: Set[str] = set()
+        # Lowercased-key mirrors of the mappings for case-insensitive lookups
+        self.broker_mapping_ci: Dict[str, str] = {}
+        self.carrier_mapping_ci: Dict[str, str] = {}
+        self.policy_type_mapping_ci: Dict[str, str] = {}
+        
+        # Initialize exclusion sets; frozen so callers can test membership on them directly
+        self.non_policy_types: FrozenSet[str] = frozenset()
+        self.non_carrier_entries: FrozenSet[str] = frozenset()
         
         # Initialize unmapped values tracking
         self.unmapped_values = {
@@ -50,6 +57,10 @@ class MappingManager:
             'policy_types': []
         }
         
+        # Membership sets mirroring unmapped_values, and whether it has unsaved changes
+        self._unmapped_sets: Dict[str, Set[str]] = {}
+        self._dirty = False
+        
         # Load mappings - this will exit if critical files are missing
         self._load_mappings()
         self._load_exclusions()
@@ -75,32 +86,50 @@ class MappingManager:
             logger.error("These files must exist and cannot be regenerated. Exiting to prevent data loss.")
             sys.exit(1)
                 
-        # Load mappings from files
+        # Load mappings from files, reading them concurrently since each is independent I/O
+        with ThreadPoolExecutor(max_workers=len(mapping_files)) as executor:
+            futures = {
+                key: executor.submit(self._read_json, self.mappings_dir / filename)
+                for key, filename in mapping_files.items()
+            }
+        
         for key, filename in mapping_files.items():
-            path = self.mappings_dir / filename
             try:
-                with path.open('r') as f:
-                    mapping = json.load(f)
+                mapping = futures[key].result()
+                    
+                # Keys differing only in case keep the first entry's target
+                mapping_ci = {}
+                for source, target in mapping.items():
+                    mapping_ci.setdefault(source.lower(), target)
                     
                 if key == 'broker':
                     self.broker_mapping = mapping
+                    self.broker_mapping_ci = mapping_ci
                 elif key == 'carrier':
                     self.carrier_mapping = mapping
+                    self.carrier_mapping_ci = mapping_ci
                 elif key == 'policy_type':
                     self.policy_type_mapping = mapping
+                    self.policy_type_mapping_ci = mapping_ci
                     
                 logger.info(f"Loaded {len(mapping)} entries from {filename}")
             except Exception as e:
                 logger.error(f"Error loading {filename}: {e}")
                 sys.exit(1)
     
+    @staticmethod
+    def _read_json(path: Path):
+        """Read and parse a JSON file."""
+        with path.open('rb') as f:
+            return json_utils.loads(f.read())
+    
     def _load_exclusions(self) -> None:
         """Load exclusion sets."""
         path = self.mappings_dir / 'exclusion_mapping.json'
         if not path.exists():
             logger.warning(f"Exclusion file {path} not found, using default exclusions")
             # Default exclusions
-            self.non_policy_types = {
+            self.non_policy_types = frozenset({
                 "2nd Payment", "2nd payment", "3rd payment", "Additional Broker Fee", 
                 "Additional Premium", "Audit Payment", "Broker Fee", "Declined", 
                 "Full Refund", "Full refund", "GL 2nd Payment", "GL 2nd Paymnet", 
@@ -109,8 +138,8 @@ class MappingManager:
                 "Payment to carrier", "Redunded", "Refund", "Refunded", 
                 "VOIDED", "Voided", "new GL 2nd payment", "October Installment",
                 "Payment to Carrier", "Second Payment", "Second payment"
-            }
-            self.non_carrier_entries = {
+            })
+            self.non_carrier_entries = frozenset({
                 "2nd Payment", "2nd payment", "3rd payment", "Additional Broker Fee",
                 "Additional Premium", "Audit Payment", "Broker Fee", "Declined",
                 "Full Refund", "Full refund", "Monthly Payment", "Monthly payment",
@@ -118,14 +147,14 @@ class MappingManager:
                 "Payment disputed", "Payment to Carrier", "Payment to carrier",
                 "Refund", "Refunded", "Second Payment", "Second payment",
                 "VOIDED", "Voided"
-            }
+            })
             return
             
         try:
-            with path.open('r') as f:
-                exclusions = json.load(f)
-                self.non_policy_types = set(exclusions.get('non_policy_types', []))
-                self.non_carrier_entries = set(exclusions.get('non_carrier_entries', []))
+            with path.open('rb') as f:
+                exclusions = json_utils.loads(f.read())
+                self.non_policy_types = frozenset(exclusions.get('non_policy_types', []))
+                self.non_carrier_entries = frozenset(exclusions.get('non_carrier_entries', []))
                 logger.info(f"Loaded {len(self.non_policy_types)} non-policy types and {len(self.non_carrier_entries)} non-carrier entries")
         except Exception as e:
             logger.error(f"Error loading exclusions: {e}")
@@ -139,24 +168,25 @@ class MappingManager:
             return
             
         try:
-            with path.open('r') as f:
-                self.unmapped_values = json.load(f)
+            with path.open('rb') as f:
+                self.unmapped_values = json_utils.loads(f.read())
                 logger.info(f"Loaded unmapped values: {len(self.unmapped_values.get('carriers', []))} carriers, {len(self.unmapped_values.get('policy_types', []))} policy types, {len(self.unmapped_values.get('brokers', []))} brokers")
         except Exception as e:
             logger.error(f"Error loading unmapped values: {e}")
+        self._unmapped_sets = {key: set(values) for key, values in self.unmapped_values.items()}
     
     def _save_unmapped_values(self) -> None:
         """Save unmapped values to file."""
         path = self.mappings_dir / 'unmatched_values.json'
         try:
-            with path.open('w') as f:
-                json.dump(self.unmapped_values, f, indent=4)
+            with path.open('wb') as f:
+                f.write(json_utils.dumps(self.unmapped_values, indent=True))
             logger.info(f"Updated unmapped values in {path}")
         except Exception as e:
             logger.error(f"Error saving unmapped values: {e}")
     
     def track_unmapped_value(self, value_type: str, value: str) -> None:
-        """Track an unmapped value.
+        """Track an unmapped value in memory; call flush() to save it.
         
         Args:
             value_type: Type of value ('carrier', 'policy_type', or 'broker')
@@ -166,12 +196,18 @@ class MappingManager:
             return
             
         plural_type = f"{value_type}s"
-        if value not in self.unmapped_values.get(plural_type, []):
-            if plural_type not in self.unmapped_values:
-                self.unmapped_values[plural_type] = []
-            self.unmapped_values[plural_type].append(value)
+        seen = self._unmapped_sets.setdefault(plural_type, set())
+        if value not in seen:
+            seen.add(value)
+            self.unmapped_values.setdefault(plural_type, []).append(value)
             logger.warning(f"Unmapped {value_type} value: {value}")
+            self._dirty = True
+    
+    def flush(self) -> None:
+        """Save unmapped values if any were tracked since the last save."""
+        if self._dirty:
             self._save_unmapped_values()
+            self._dirty = False
     
     def get_mappings(self) -> Dict[str, Dict[str, str]]:
         """Get all mappings.
@@ -185,7 +221,7 @@ class MappingManager:
             'policy_type': self.policy_type_mapping
         }
     
-    def get_exclusions(self) -> Tuple[Set[str], Set[str]]:
+    def get_exclusions(self) -> Tuple[FrozenSet[str], FrozenSet[str]]:
         """Get exclusion sets.
         
         Returns:
@@ -216,6 +252,7 @@ class MappingManager:
             
         # Instead of updating the mapping files, just track as unmapped
         self.track_unmapped_value(mapping_type, source)
+        self.flush()
         
         logger.warning(f"Mapping request for {mapping_type}: '{source}' -> '{target}' was recorded in unmatched_values.json")
         logger.warning("Critical mapping files are protected and were not modified")
@@ -231,9 +268,9 @@ class MappingManager:
             return
             
         if exclusion_type == 'policy_type':
-            self.non_policy_types.add(value)
+            self.non_policy_types = self.non_policy_types | {value}
         elif exclusion_type == 'carrier':
-            self.non_carrier_entries.add(value)
+            self.non_carrier_entries = self.non_carrier_entries | {value}
         else:
             logger.warning(f"Unknown exclusion type: {exclusion_type}")
             return
@@ -245,8 +282,8 @@ class MappingManager:
                 'non_policy_types': list(self.non_policy_types),
                 'non_carrier_entries': list(self.non_carrier_entries)
             }
-            with path.open('w') as f:
-                json.dump(exclusions, f, indent=4)
+            with path.open('wb') as f:
+                f.write(json_utils.dumps(exclusions, indent=True))
             logger.info(f"Updated exclusions in {path}")
         except Exception as e:
             logger.error(f"Error saving exclusions: {e}")
@@ -285,18 +322,43 @@ class MappingManager:
         if not value:
             return default
             
-        if mapping_type == 'broker':
-            mapped = self.broker_mapping.get(value)
-        elif mapping_type == 'carrier':
-            mapped = self.carrier_mapping.get(value)
-        elif mapping_type == 'policy_type':
-            mapped = self.policy_type_mapping.get(value)
-        else:
+        if mapping_type not in ('broker', 'carrier', 'policy_type'):
             logger.warning(f"Unknown mapping type: {mapping_type}")
             return default
             
+        mapped = self.get_mapped_value_ci(mapping_type, value)
         if mapped is None:
             self.track_unmapped_value(mapping_type, value)
             return default
             
-        return mapped 
\ No newline at end of file
+        return mapped 
+    
+    def get_mapped_value_ci(self, mapping_type: str, value: str, default: Optional[str] = None) -> Optional[str]:
+        """Get a mapped value, falling back to a case-insensitive match.
+        
+        Exact matches take precedence; unmapped values are not tracked.
+        
+        Args:
+            mapping_type: Type of mapping ('broker', 'carrier', or 'policy_type')
+            value: Source value
+            default: Default value if not found
+        
+        Returns:
+            Mapped value or default if not found
+        """
+        if not value:
+            return default
+            
+        if mapping_type == 'broker':
+            mapping, mapping_ci = self.broker_mapping, self.broker_mapping_ci
+        elif mapping_type == 'carrier':
+            mapping, mapping_ci = self.carrier_mapping, self.carrier_mapping_ci
+        elif mapping_type == 'policy_type':
+            mapping, mapping_ci = self.policy_type_mapping, self.policy_type_mapping_ci
+        else:
+            return default
+            
+        mapped = mapping.get(value)
+        if mapped is None:
+            mapped = mapping_ci.get(value.lower())
+        return default if mapped is None else mapped
@@ -3,13 +3,21 @@ Policy processing functionality for insurance policy migration.
 Handles policy validation, normalization, and mapping.
 """
 
-import json
+import functools
 import logging
 import re
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Set, Tuple, Optional
+from typing import Any, Callable, Dict, FrozenSet, List, Set, Tuple, Optional, Union
+
+from . import json_utils
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
 
 # Configure logger
 logger = logging.getLogger('processing')
@@ -34,12 +42,49 @@ CARRIER_MAPPINGS = {
     'TRAVELERS': 'Travelers Casualty Company'
 }
 
+# Uppercased carrier patterns, checked in order against uppercased values
+_CARRIER_PATTERNS = [(pattern.upper(), mapped_name) for pattern, mapped_name in CARRIER_MAPPINGS.items()]
+
+# With pyahocorasick installed, find all patterns in one pass over the value;
+# each pattern keeps its list index so the earliest listed match still wins
+_CARRIER_AUTOMATON = None
+if ahocorasick is not None:
+    _CARRIER_AUTOMATON = ahocorasick.Automaton()
+    for index, (pattern, mapped_name) in enumerate(_CARRIER_PATTERNS):
+        _CARRIER_AUTOMATON.add_word(pattern, (index, mapped_name))
+    _CARRIER_AUTOMATON.make_automaton()
+
+# Common suffixes for insurance company names, stripped with one anchored regex;
+# the leftmost match is the longest suffix, which is also the first in list order
+CARRIER_SUFFIXES = [
+    'Insurance Company', 'Insurance Co', 'Insurance', 'Ins Co', 'Ins.',
+    'Ins', 'Inc.', 'Inc', 'LLC', 'Corp.', 'Corp', 'Company', 'Co.'
+]
+_CARRIER_SUFFIX_RE = re.compile(
+    ' (?:' + '|'.join(re.escape(suffix.upper()) for suffix in CARRIER_SUFFIXES) + r')\Z'
+)
+
+# Common policy number prefixes, stripped with one anchored case-insensitive regex
+# that tries them in list order
+POLICY_NUMBER_PREFIXES = ['Policy #', 'Policy#', 'Policy ', 'Policy: ', '#']
+_POLICY_NUMBER_PREFIX_RE = re.compile(
+    '^(?:' + '|'.join(re.escape(prefix) for prefix in POLICY_NUMBER_PREFIXES) + ')',
+    re.IGNORECASE
+)
+
 def clean_value(value: str, field_type: str = 'default') -> str:
     """Clean and normalize a value for mapping lookup."""
-    if pd.isna(value) or not value:
+    # Strings are never missing values, so skip pd.isna for them
+    if isinstance(value, str):
+        return _clean_value_cached(value, field_type) if value else ""
+    if value is None or pd.isna(value) or not value:
         return ""
-    
-    value = str(value).strip()
+    return _clean_value_cached(str(value), field_type)
+
+@functools.lru_cache(maxsize=8192)
+def _clean_value_cached(value: str, field_type: str) -> str:
+    """Clean a non-empty string value; cached since carriers and brokers repeat heavily."""
+    value = value.strip()
     
     # Special handling for broker names
     if field_type == 'broker':
@@ -51,19 +96,19 @@ def clean_value(value: str, field_type: str = 'default') -> str:
         value = value.upper()
         
         # Try to match against carrier mappings
-        for pattern, mapped_name in CARRIER_MAPPINGS.items():
-            if pattern.upper() in value:
-                return mapped_name
+        if _CARRIER_AUTOMATON is not None:
+            matches = [match for _, match in _CARRIER_AUTOMATON.iter(value)]
+            if matches:
+                return min(matches)[1]
+        else:
+            for pattern, mapped_name in _CARRIER_PATTERNS:
+                if pattern in value:
+                    return mapped_name
         
         # Remove common suffixes for insurance companies
-        suffixes = [
-            'Insurance Company', 'Insurance Co', 'Insurance', 'Ins Co', 'Ins.',
-            'Ins', 'Inc.', 'Inc', 'LLC', 'Corp.', 'Corp', 'Company', 'Co.'
-        ]
-        for suffix in suffixes:
-            if value.endswith(f" {suffix.upper()}"):
-                value = value[:-len(suffix)-1]
-                break
+        match = _CARRIER_SUFFIX_RE.search(value)
+        if match:
+            value = value[:match.start()]
         
         return value.title()
     
@@ -71,188 +116,110 @@ def clean_value(value: str, field_type: str = 'default') -> str:
 
 def clean_policy_number(policy_number: str) -> str:
     """Clean and normalize a policy number."""
-    if pd.isna(policy_number) or not policy_number:
+    if isinstance(policy_number, str):
+        return _clean_policy_number_cached(policy_number) if policy_number else ""
+    if policy_number is None or pd.isna(policy_number) or not policy_number:
         return ""
-    
-    policy_number = str(policy_number).strip()
-    
-    # Remove common prefixes
-    prefixes = ['Policy #', 'Policy#', 'Policy ', 'Policy: ', '#']
-    for prefix in prefixes:
-        if policy_number.startswith(prefix):
-            policy_number = policy_number[len(prefix):]
-            break
+    return _clean_policy_number_cached(str(policy_number))
+
+@functools.lru_cache(maxsize=8192)
+def _clean_policy_number_cached(policy_number: str) -> str:
+    """Clean a non-empty policy number string."""
+    # Remove the first matching common prefix
+    policy_number = _POLICY_NUMBER_PREFIX_RE.sub('', policy_number.strip(), count=1)
     
     return policy_number.strip()
 
-def validate_policy(
-    policy: Dict, 
-    carriers_map: Dict, 
-    non_policy_types: Set[str], 
-    non_carrier_entries: Set[str],
-    logger: logging.Logger
-) -> bool:
-    """
-    Validate a policy by checking required fields and carrier mapping.
-    
-    Args:
-        policy: Policy dictionary
-        carriers_map: Dictionary mapping carrier names to IDs
-        non_policy_types: Set of strings that are not valid policy types
-        non_carrier_entries: Set of strings that are not valid carrier names
-        logger: Logger instance
-        
-    Returns:
-        True if policy is valid, False otherwise
-    """
-    # Check for required fields
-    required_fields = ['insured_name', 'policy_number', 'carrier', 'policy_type']
-    for field in required_fields:
-        if field not in policy or not policy[field]:
-            logger.info(f"Missing required field: {field}")
-            return False
-    
-    # Clean policy number
-    policy_number = clean_policy_number(policy['policy_number'])
-    if not policy_number:
-        logger.info(f"Moving policy with invalid number '{policy['policy_number']}' to invalid list")
-        return False
-    
-    # Check for refund in policy number
-    if 'refund' in policy_number.lower():
-        logger.info(f"Moving policy {policy_number} to invalid list due to 'refund' in policy number")
-        return False
-    
-    # Check for valid carrier
-    carrier = clean_value(policy['carrier'], field_type='carrier')
-    carrier_upper = carrier.upper()
-    
-    # First check exclusions
-    if carrier in non_carrier_entries:
-        logger.info(f"Moving policy {policy_number} to invalid list due to invalid carrier: '{carrier}'")
-        return False
-    
-    # Then try matching through carrier mappings
-    mapped_carrier = None
-    if carrier_upper in CARRIER_MAPPINGS:
-        mapped_carrier = CARRIER_MAPPINGS[carrier_upper]
-        logger.debug(f"Found carrier mapping: {carrier} -> {mapped_carrier}")
-    
-    # Check if carrier exists in AMS
-    carrier_exists = False
-    for ams_carrier in carriers_map.values():
-        if carrier.lower() == ams_carrier['carrier_name'].lower():
-            carrier_exists = True
-            break
-        if mapped_carrier and mapped_carrier.lower() == ams_carrier['carrier_name'].lower():
-            carrier_exists = True
-            break
-    
-    if not carrier_exists:
-        logger.debug(f"Carrier not found in AMS: {carrier}")
-        # We'll still process it, but it will be flagged for creation
-    
-    # Check for valid policy type
-    policy_type = clean_value(policy['policy_type'])
-    if policy_type in non_policy_types:
-        logger.info(f"Moving policy {policy_number} to invalid list due to invalid policy type: '{policy_type}'")
-        return False
-    
-    return True
+# Date formats tried, in order, when normalizing date fields
+NORMALIZED_DATE_FORMATS = ['%Y-%m-%d', '%m/%d/%Y', '%m-%d-%Y', '%d/%m/%Y']
 
-def normalize_policy_fields(
-    policy: Dict,
-    carriers_map: Dict,
-    insureds_map: Dict,
-    mappings: Dict[str, Dict[str, str]],
+# Only formats with a matching separator can parse a value, so try just those
+_SLASH_DATE_FORMATS = [fmt for fmt in NORMALIZED_DATE_FORMATS if '/' in fmt]
+_DASH_DATE_FORMATS = [fmt for fmt in NORMALIZED_DATE_FORMATS if '-' in fmt]
+
+# Zero-padded YYYY-MM-DD strings come out of formatting unchanged, valid or not
+_ISO_DATE_RE = re.compile(r'[0-9]{4}-[0-9]{2}-[0-9]{2}\Z')
+
+def format_date_value(value: Any) -> Any:
+    """Reformat a date string to YYYY-MM-DD, leaving other values unchanged."""
+    if value and isinstance(value, str):
+        if _ISO_DATE_RE.match(value):
+            return value
+        if '/' in value:
+            formats = _SLASH_DATE_FORMATS
+        elif '-' in value:
+            formats = _DASH_DATE_FORMATS
+        else:
+            return value
+        for fmt in formats:
+            try:
+                return datetime.strptime(value, fmt).strftime('%Y-%m-%d')
+            except ValueError:
+                continue
+    return value
+
+def ams_carrier_name_index(carriers_map: Dict) -> FrozenSet[str]:
+    """Build the set of lowercased AMS carrier names used to check carriers exist in AMS."""
+    return frozenset(ams_carrier['carrier_name'].lower() for ams_carrier in carriers_map.values())
+
+def _map_unique(values: pd.Series, func: Callable[[Any], Any]) -> np.ndarray:
+    """Apply func once per distinct value of a column and broadcast the results back to every row."""
+    if values.dtype == object and pd.api.types.infer_dtype(values, skipna=True).startswith('mixed'):
+        # factorize treats 1001, 1001.0 and True as one value; key on type as well to keep them apart
+        codes, uniques = pd.factorize(pd.Series(list(zip(map(type, values), values)), dtype=object))
+        uniques = [value for _, value in uniques]
+    else:
+        codes, uniques = pd.factorize(values)
+    mapped = np.empty(len(uniques) + 1, dtype=object)
+    mapped[:-1] = [func(value) for value in uniques]
+    result = mapped[codes]
+    
+    # Missing values are not factorized, so apply func to them row by row
+    missing = codes == -1
+    if missing.any():
+        result[missing] = [func(value) for value in values.to_numpy(dtype=object)[missing]]
+    return result
+
+def _map_field(
+    cleaned: np.ndarray,
+    mapping: Dict[str, str],
+    track: Callable[[str], bool],
+    value_type: str,
     mapping_manager,
     logger: logging.Logger
-) -> Dict:
+) -> np.ndarray:
     """
-    Normalize policy fields for AMS upload.
+    Replace cleaned values with their mapped names and track unmapped ones.
     
     Args:
-        policy: Policy dictionary
-        carriers_map: Dictionary mapping carrier names to IDs
-        insureds_map: Dictionary mapping insured names to IDs
-        mappings: Dictionary containing all mappings
+        cleaned: Cleaned values, one per policy
+        mapping: Mapping from cleaned values to target names
+        track: Predicate deciding whether an unmapped value is tracked
+        value_type: Type of value ('carrier', 'policy_type', or 'broker')
         mapping_manager: MappingManager instance for tracking unmapped values
         logger: Logger instance
     
     Returns:
-        Normalized policy dictionary
+        Mapped values, one per policy
     """
-    # Create a copy to avoid modifying the original
-    normalized = policy.copy()
-    
-    # Clean and normalize fields
-    if 'policy_number' in normalized:
-        normalized['policy_number'] = clean_policy_number(normalized['policy_number'])
-    
-    if 'carrier' in normalized:
-        carrier = clean_value(normalized['carrier'], 'carrier')
-        normalized['carrier'] = carrier
-        
-        # Try to map carrier name
-        mapped_carrier = mappings['carrier'].get(carrier)
-        if mapped_carrier:
-            normalized['carrier'] = mapped_carrier
-        else:
-            # Track unmapped carrier
-            if carrier and not mapping_manager.is_excluded('carrier', carrier):
-                mapping_manager.track_unmapped_value('carrier', carrier)
-                logger.warning(f"Unmapped carrier: {carrier}")
-    
-    if 'policy_type' in normalized:
-        policy_type = clean_value(normalized['policy_type'])
-        normalized['policy_type'] = policy_type
-        
-        # Try to map policy type
-        mapped_policy_type = mappings['policy_type'].get(policy_type)
-        if mapped_policy_type:
-            normalized['policy_type'] = mapped_policy_type
-        else:
-            # Track unmapped policy type
-            if policy_type and not mapping_manager.is_excluded('policy_type', policy_type):
-                mapping_manager.track_unmapped_value('policy_type', policy_type)
-                logger.warning(f"Unmapped policy type: {policy_type}")
-    
-    if 'broker' in normalized:
-        broker = clean_value(normalized['broker'], 'broker')
-        normalized['broker'] = broker
-        
-        # Try to map broker name
-        mapped_broker = mappings['broker'].get(broker)
-        if mapped_broker:
-            normalized['broker'] = mapped_broker
-        else:
-            # Track unmapped broker
-            if broker:
-                mapping_manager.track_unmapped_value('broker', broker)
-                logger.warning(f"Unmapped broker: {broker}")
-    
-    # Format dates
-    date_fields = ['effective_date', 'expiration_date', 'transaction_date']
-    for field in date_fields:
-        if field in normalized and normalized[field]:
-            try:
-                date_value = normalized[field]
-                if isinstance(date_value, str):
-                    # Try different date formats
-                    for fmt in ['%Y-%m-%d', '%m/%d/%Y', '%m-%d-%Y', '%d/%m/%Y']:
-                        try:
-                            date_obj = datetime.strptime(date_value, fmt)
-                            normalized[field] = date_obj.strftime('%Y-%m-%d')
-                            break
-                        except ValueError:
-                            continue
-            except Exception as e:
-                logger.warning(f"Error formatting date {field}: {e}")
-    
-    return normalized
+    # Look up each distinct value once, falling back to a case-insensitive match
+    lookups = {
+        value: mapping.get(value) or mapping_manager.get_mapped_value_ci(value_type, value)
+        for value in pd.unique(cleaned)
+    }
+    mapped = np.empty(len(cleaned), dtype=object)
+    mapped[:] = [lookups[value] or value for value in cleaned]
+    
+    # Track each unmapped value once, in order of first appearance
+    label = value_type.replace('_', ' ')
+    for value, target in lookups.items():
+        if not target and track(value):
+            mapping_manager.track_unmapped_value(value_type, value)
+            logger.warning(f"Unmapped {label}: {value}")
+    return mapped
 
 def process_policies(
-    policies: List[Dict],
+    policies: Union[pd.DataFrame, List[Dict]],
     carriers_map: Dict,
     insureds_map: Dict,
     mappings: Dict[str, Dict[str, str]],
@@ -262,13 +229,16 @@ def process_policies(
     non_policy_types: Set[str] = None,
     non_carrier_entries: Set[str] = None,
     dry_run: bool = False,
-    existing_policies: Dict = None
+    existing_policies: Set[str] = None
 ) -> Tuple[List[Dict], List[Dict], Dict]:
     """
     Process policies for AMS upload.
     
+    Validates and normalizes whole columns at once, running each cleaning
+    function once per distinct value.
+    
     Args:
-        policies: List of policy dictionaries
+        policies: DataFrame of policies, or a list of policy dictionaries (missing keys are filled with None)
         carriers_map: Dictionary mapping carrier names to IDs
         insureds_map: Dictionary mapping insured names to IDs
         mappings: Dictionary containing all mappings
@@ -278,7 +248,7 @@ def process_policies(
         non_policy_types: Set of policy types to exclude
         non_carrier_entries: Set of carrier entries to exclude
         dry_run: Whether to run in dry-run mode
-        existing_policies: Dictionary of existing policies
+        existing_policies: Set of "policy_number-carrier" keys already in AMS; new keys are added to it
     
     Returns:
         Tuple containing valid policies, invalid policies, and statistics
@@ -288,12 +258,17 @@ def process_policies(
     if non_carrier_entries is None:
         non_carrier_entries = set()
     if existing_policies is None:
-        existing_policies = {}
+        existing_policies = set()
+    
+    if isinstance(policies, pd.DataFrame):
+        df = policies.reset_index(drop=True)
+    else:
+        # Keys missing from some policies become None, so they still count as empty
+        columns = list(dict.fromkeys(key for policy in policies for key in policy))
+        df = pd.DataFrame([[policy.get(col) for col in columns] for policy in policies], columns=columns, dtype=object)
     
-    valid_policies = []
-    invalid_policies = []
     stats = {
-        'total': len(policies),
+        'total': len(df),
         'valid': 0,
         'invalid': 0,
         'duplicate': 0,
@@ -302,55 +277,145 @@ def process_policies(
         'unmapped_brokers': set()
     }
     
-    for policy in policies:
-        # Validate policy
-        if not validate_policy(policy, carriers_map, non_policy_types, non_carrier_entries, logger):
-            invalid_policies.append(policy)
-            stats['invalid'] += 1
-            continue
-        
-        # Normalize policy fields
-        normalized = normalize_policy_fields(policy, carriers_map, insureds_map, mappings, mapping_manager, logger)
-        
-        # Check for duplicates
-        policy_key = f"{normalized.get('policy_number', '')}-{normalized.get('carrier', '')}"
-        if policy_key in existing_policies:
-            logger.info(f"Skipping duplicate policy: {policy_key}")
-            stats['duplicate'] += 1
-            continue
-        
-        # Track unmapped values for statistics
-        carrier = normalized.get('carrier', '')
-        policy_type = normalized.get('policy_type', '')
-        broker = normalized.get('broker', '')
+    # Validate policies: the first failed check decides the reason logged,
+    # and reasons are only formatted when they will be logged
+    required_fields = ['insured_name', 'policy_number', 'carrier', 'policy_type']
+    invalid = np.zeros(len(df), dtype=bool)
+    reasons = np.empty(len(df), dtype=object)
+    log_reasons = logger.isEnabledFor(logging.INFO)
+    
+    def reject(mask: np.ndarray, reason: Callable[[int], str]) -> None:
+        new = mask & ~invalid
+        if log_reasons:
+            for i in np.flatnonzero(new):
+                reasons[i] = reason(i)
+        invalid[new] = True
+    
+    for field in required_fields:
+        if field in df.columns:
+            present = _map_unique(df[field], bool).astype(bool)
+        else:
+            present = np.zeros(len(df), dtype=bool)
+        reject(~present, lambda i, field=field: f"Missing required field: {field}")
+    
+    if not invalid.all():
+        raw_numbers = df['policy_number'].to_numpy(dtype=object)
+        policy_numbers = _map_unique(df['policy_number'], clean_policy_number)
+        carriers = _map_unique(df['carrier'], lambda value: clean_value(value, field_type='carrier'))
+        policy_types = _map_unique(df['policy_type'], clean_value)
         
-        if carrier and carrier not in carriers_map and not mapping_manager.is_excluded('carrier', carrier):
-            stats['unmapped_carriers'].add(carrier)
+        reject(
+            policy_numbers == "",
+            lambda i: f"Moving policy with invalid number '{raw_numbers[i]}' to invalid list"
+        )
+        reject(
+            _map_unique(pd.Series(policy_numbers), lambda value: 'refund' in value.lower()).astype(bool),
+            lambda i: f"Moving policy {policy_numbers[i]} to invalid list due to 'refund' in policy number"
+        )
+        reject(
+            _map_unique(pd.Series(carriers), lambda value: value in non_carrier_entries).astype(bool),
+            lambda i: f"Moving policy {policy_numbers[i]} to invalid list due to invalid carrier: '{carriers[i]}'"
+        )
         
-        if policy_type and policy_type not in mappings['policy_type'] and not mapping_manager.is_excluded('policy_type', policy_type):
-            stats['unmapped_policy_types'].add(policy_type)
+        # Carriers missing from AMS are still processed, but flagged for creation;
+        # the check only feeds debug messages, so skip it when they are not logged
+        if logger.isEnabledFor(logging.DEBUG):
+            ams_carrier_names = ams_carrier_name_index(carriers_map)
+            for carrier in pd.unique(carriers[~invalid]):
+                mapped_carrier = CARRIER_MAPPINGS.get(carrier.upper())
+                if mapped_carrier is not None:
+                    logger.debug("Found carrier mapping: %s -> %s", carrier, mapped_carrier)
+                if carrier.lower() not in ams_carrier_names and (
+                    mapped_carrier is None or mapped_carrier.lower() not in ams_carrier_names
+                ):
+                    logger.debug("Carrier not found in AMS: %s", carrier)
         
-        if broker and broker not in mappings['broker']:
-            stats['unmapped_brokers'].add(broker)
+        reject(
+            _map_unique(pd.Series(policy_types), lambda value: value in non_policy_types).astype(bool),
+            lambda i: f"Moving policy {policy_numbers[i]} to invalid list due to invalid policy type: '{policy_types[i]}'"
+        )
+    
+    if log_reasons:
+        for reason in reasons[invalid]:
+            logger.info(reason)
+    invalid_policies = df[invalid].to_dict('records')
+    stats['invalid'] = len(invalid_policies)
+    
+    # Normalize fields of the policies that passed validation
+    excluded_carriers = mapping_manager.non_carrier_entries
+    excluded_policy_types = mapping_manager.non_policy_types
+    # take() returns a new frame that is not flagged as a view of df, so the
+    # normalized columns can be assigned to it in place without another copy
+    normalized = df.take(np.flatnonzero(~invalid))
+    if not normalized.empty:
+        valid_rows = ~invalid
+        normalized['policy_number'] = policy_numbers[valid_rows]
+        normalized['carrier'] = _map_field(
+            carriers[valid_rows], mappings['carrier'],
+            lambda value: bool(value) and value not in excluded_carriers,
+            'carrier', mapping_manager, logger
+        )
+        normalized['policy_type'] = _map_field(
+            policy_types[valid_rows], mappings['policy_type'],
+            lambda value: bool(value) and value not in excluded_policy_types,
+            'policy_type', mapping_manager, logger
+        )
+        if 'broker' in normalized.columns:
+            brokers = _map_unique(normalized['broker'], lambda value: clean_value(value, 'broker'))
+            normalized['broker'] = _map_field(brokers, mappings['broker'], bool, 'broker', mapping_manager, logger)
         
-        valid_policies.append(normalized)
-        stats['valid'] += 1
-        existing_policies[policy_key] = True
-    
-    # Convert sets to lists for JSON serialization
-    stats['unmapped_carriers'] = list(stats['unmapped_carriers'])
-    stats['unmapped_policy_types'] = list(stats['unmapped_policy_types'])
-    stats['unmapped_brokers'] = list(stats['unmapped_brokers'])
+        for field in ['effective_date', 'expiration_date', 'transaction_date']:
+            if field in normalized.columns:
+                normalized[field] = _map_unique(normalized[field], format_date_value)
+    
+    # Check for duplicates against existing policies and earlier rows
+    policy_keys = pd.Series(
+        [f"{number}-{carrier}" for number, carrier in zip(normalized.get('policy_number', []), normalized.get('carrier', []))],
+        index=normalized.index, dtype=object
+    )
+    duplicate = policy_keys.duplicated()
+    if existing_policies:
+        duplicate |= policy_keys.isin(existing_policies)
+    duplicate = duplicate.to_numpy()
+    for policy_key in policy_keys[duplicate]:
+        logger.info("Skipping duplicate policy: %s", policy_key)
+    stats['duplicate'] = int(duplicate.sum())
+    
+    normalized = normalized[~duplicate]
+    existing_policies.update(policy_keys[~duplicate])
+    
+    # Track unmapped values for statistics
+    if not normalized.empty:
+        for carrier in pd.unique(normalized['carrier']):
+            if carrier and carrier not in carriers_map and carrier not in excluded_carriers:
+                stats['unmapped_carriers'].add(carrier)
+        for policy_type in pd.unique(normalized['policy_type']):
+            if policy_type and policy_type not in mappings['policy_type'] and policy_type not in excluded_policy_types:
+                stats['unmapped_policy_types'].add(policy_type)
+        if 'broker' in normalized.columns:
+            for broker in pd.unique(normalized['broker']):
+                if broker and broker not in mappings['broker']:
+                    stats['unmapped_brokers'].add(broker)
+    
+    valid_policies = normalized.to_dict('records')
+    stats['valid'] = len(valid_policies)
+    
+    # Save unmapped values tracked during this run
+    mapping_manager.flush()
+    
+    # Unmapped values are saved and returned as lists, as callers expect
+    for key in ('unmapped_carriers', 'unmapped_policy_types', 'unmapped_brokers'):
+        stats[key] = list(stats[key])
     
     # Save statistics
     if not dry_run:
         output_dir.mkdir(parents=True, exist_ok=True)
         stats_file = output_dir / 'processing_stats.json'
         try:
-            with stats_file.open('w') as f:
-                json.dump(stats, f, indent=4)
+            with stats_file.open('wb') as f:
+                f.write(json_utils.dumps(stats, indent=True))
             logger.info(f"Saved processing statistics to {stats_file}")
         except Exception as e:
             logger.error(f"Error saving statistics: {e}")
     
-    return valid_policies, invalid_policies, stats 
\ No newline at end of file
+    return valid_policies, invalid_policies, stats
\ No newline at end of file
@@ -0,0 +1,48 @@
+"""
+Tests for CSV loading.
+"""
+
+import logging
+
+from insurance_migration import data_loader
+from insurance_migration.data_loader import load_csv_files
+
+def test_columns_missing_from_one_file_keep_other_files_dtypes(tmp_path):
+    (tmp_path / 'a.csv').write_text('Policy Number,Client,Month,Premium\nP1,A,1,5\nP2,B,2,\n')
+    (tmp_path / 'b.csv').write_text('Policy Number,Client,Carrier\nP3,C,X\n')
+    
+    policies = load_csv_files(tmp_path, logging.getLogger('test'))
+    records = sorted(policies.to_dict('records'), key=lambda policy: policy['policy_number'])
+    
+    assert [policy['month'] for policy in records] == [1, 2, '']
+    assert all(type(policy['month']) is not float for policy in records)
+    assert [policy['premium'] for policy in records] == [5.0, None, None]
+    assert [policy['carrier'] for policy in records] == ['', '', 'X']
+
+def test_header_only_file_loads_as_empty(tmp_path, caplog):
+    (tmp_path / 'empty.csv').write_text('Policy Number,Client\n')
+    
+    with caplog.at_level(logging.ERROR):
+        policies = load_csv_files(tmp_path, logging.getLogger('test'))
+    
+    assert len(policies) == 0
+    assert not caplog.records
+
+def test_columns_normalizing_to_the_same_name_keep_the_last(tmp_path):
+    (tmp_path / 'a.csv').write_text('Policy Number,Client,Premium,premium\nP1,A,5,6\n')
+    (tmp_path / 'b.csv').write_text('Policy Number,Client,Carrier\nP2,B,X\n')
+    
+    policies = load_csv_files(tmp_path, logging.getLogger('test'))
+    records = sorted(policies.to_dict('records'), key=lambda policy: policy['policy_number'])
+    
+    assert list(policies.columns).count('premium') == 1
+    assert [policy['premium'] for policy in records] == [6, None]
+
+def test_invalid_dates_are_reported_once_per_file(tmp_path, monkeypatch):
+    csv_file = tmp_path / 'a.csv'
+    csv_file.write_text('Policy Number,Client,Effective Date\nP1,A,bad\nP2,B,2024-01-01\nP3,C,bad\nP4,D,x\n')
+    monkeypatch.setattr(data_loader, 'CSV_CHUNK_SIZE', 2)
+    
+    _, messages = data_loader._load_single_csv(csv_file)
+    
+    assert [message for level, message in messages if level == logging.WARNING] == ['Skipped 3 rows with invalid dates in a.csv']
@@ -0,0 +1,108 @@
+"""
+Regression tests for process_policies.
+
+Expected values were produced by the original row-by-row implementation
+(validate_policy and normalize_policy_fields applied to each policy in turn).
+"""
+
+import json
+import logging
+
+import pandas as pd
+import pytest
+
+from insurance_migration.mapping_manager import MappingManager
+from insurance_migration.policy_processor import process_policies
+
+def policy(insured, number, carrier, policy_type, broker='', effective='2024-01-15', expiration='2025-01-15'):
+    return {
+        'insured_name': insured, 'policy_number': number, 'carrier': carrier, 'policy_type': policy_type,
+        'broker': broker, 'effective_date': effective, 'expiration_date': expiration
+    }
+
+POLICIES = [
+    policy('Acme Roofing', 'Policy #GL-100', 'hartford insurance company', 'GL', 'john smith', '01/15/2024'),
+    policy('', 'GL-101', 'Hartford', 'GL'),
+    policy('Bolt Plumbing', 'Refund 55', 'Hartford', 'GL'),
+    policy('Cole Electric', 'GL-102', 'Voided', 'GL'),
+    policy('Dana Painting', 'GL-103', 'Hartford', 'Refund'),
+    policy('Acme Roofing', 'GL-100', 'Hartford', 'GL', 'john smith'),
+    policy('Eve Landscaping', 'WC-7', 'ISC/TCIC Specialty', 'WC'),
+    policy('Fox Framing', 'UM-8', 'acme mutual co.', 'Umbrella', 'jane doe'),
+    policy('Gray Drywall', '#', 'Hartford', 'GL'),
+    policy('Hill Concrete', 'WC-9', 'Hartford', 'WC', 'John Smith', '13/05/2024', '05-13-2025'),
+]
+
+EXPECTED_VALID = [
+    policy('Acme Roofing', 'GL-100', 'The Hartford', 'General Liability', 'john@example.com'),
+    policy('Fox Framing', 'UM-8', 'Acme Mutual', 'Umbrella', 'Jane Doe'),
+    policy('Hill Concrete', 'WC-9', 'The Hartford', 'Workers Compensation', 'john@example.com', '2024-05-13', '2025-05-13'),
+]
+
+EXPECTED_INVALID_NUMBERS = ['GL-101', 'Refund 55', 'GL-102', 'GL-103', '#']
+
+@pytest.fixture
+def mapping_manager(tmp_path):
+    mappings_dir = tmp_path / 'mappings'
+    mappings_dir.mkdir()
+    files = {
+        'broker_mapping.json': {'John Smith': 'john@example.com'},
+        'carrier_mapping.json': {'Hartford': 'The Hartford'},
+        'policy_type_mapping.json': {'GL': 'General Liability', 'WC': 'Workers Compensation'},
+        'exclusion_mapping.json': {'non_policy_types': ['Refund'], 'non_carrier_entries': ['Voided']},
+    }
+    for filename, content in files.items():
+        (mappings_dir / filename).write_text(json.dumps(content))
+    return MappingManager(mappings_dir)
+
+@pytest.mark.parametrize('as_frame', [False, True], ids=['records', 'dataframe'])
+def test_process_policies_matches_row_wise_baseline(mapping_manager, tmp_path, as_frame):
+    policies = pd.DataFrame(POLICIES, dtype=object) if as_frame else [dict(p) for p in POLICIES]
+    non_policy_types, non_carrier_entries = mapping_manager.get_exclusions()
+    
+    valid, invalid, stats = process_policies(
+        policies=policies,
+        carriers_map={'c1': {'carrier_name': 'The Hartford'}},
+        insureds_map={},
+        mappings=mapping_manager.get_mappings(),
+        mapping_manager=mapping_manager,
+        output_dir=tmp_path / 'reports',
+        logger=logging.getLogger('test'),
+        non_policy_types=non_policy_types,
+        non_carrier_entries=non_carrier_entries,
+        existing_policies={'WC-7-TCI Insurance Company'}
+    )
+    
+    assert valid == EXPECTED_VALID
+    assert [p['policy_number'] for p in invalid] == EXPECTED_INVALID_NUMBERS
+    assert (stats['total'], stats['valid'], stats['invalid'], stats['duplicate']) == (10, 3, 5, 2)
+    assert sorted(stats['unmapped_carriers']) == ['Acme Mutual', 'The Hartford']
+    assert sorted(stats['unmapped_policy_types']) == ['General Liability', 'Umbrella', 'Workers Compensation']
+    assert sorted(stats['unmapped_brokers']) == ['Jane Doe', 'john@example.com']
+    assert all(isinstance(stats[key], list) for key in ('unmapped_carriers', 'unmapped_policy_types', 'unmapped_brokers'))
+    
+    saved = json.loads((tmp_path / 'reports' / 'processing_stats.json').read_text())
+    assert saved['valid'] == 3
+
+@pytest.mark.parametrize('as_frame', [False, True], ids=['records', 'dataframe'])
+def test_mixed_type_policy_numbers_are_not_merged(mapping_manager, tmp_path, as_frame):
+    numbers = [('Acme Roofing', 1001), ('Bolt Plumbing', 1001.0), ('Cole Electric', True), ('Dana Painting', 1001)]
+    records = [policy(insured, number, 'Hartford', 'GL') for insured, number in numbers]
+    policies = pd.DataFrame(records, dtype=object) if as_frame else records
+    
+    valid, invalid, stats = process_policies(
+        policies=policies,
+        carriers_map={},
+        insureds_map={},
+        mappings=mapping_manager.get_mappings(),
+        mapping_manager=mapping_manager,
+        output_dir=tmp_path / 'reports',
+        logger=logging.getLogger('test'),
+        non_policy_types=[],
+        non_carrier_entries=[],
+        existing_policies=set()
+    )
+    
+    assert [p['policy_number'] for p in valid] == ['1001', '1001.0', 'True']
+    assert not invalid
+    assert stats['duplicate'] == 1